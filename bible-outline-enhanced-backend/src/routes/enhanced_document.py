@@ -6,6 +6,9 @@ from flask import Blueprint, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 import os
 import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from src.utils.enhanced_processor import EnhancedProcessor
 from openai import OpenAI
 
@@ -40,12 +43,19 @@ def get_enhanced_processor():
 UPLOAD_FOLDER = tempfile.gettempdir()
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt'}
 
+# Documents processed in the background at once for /upload-async
+JOB_WORKERS = 2
+
+# Background processing of uploads; jobs are recorded in the session store
+# under this prefix, so any worker can answer a status poll
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='upload-job')
+JOB_SESSION_PREFIX = 'job_'
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@enhanced_bp.route('/upload', methods=['POST'])
-def enhanced_upload():
-    """Upload and process document with hybrid detection"""
+def validate_upload():
+    """Get the error response for a request without a usable uploaded file, or None"""
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
     
@@ -56,6 +66,17 @@ def enhanced_upload():
     if not allowed_file(file.filename):
         return jsonify({'error': 'File type not allowed'}), 400
     
+    return None
+
+@enhanced_bp.route('/upload', methods=['POST'])
+def enhanced_upload():
+    """Upload and process document with hybrid detection"""
+    error = validate_upload()
+    if error:
+        return error
+    
+    file = request.files['file']
+    
     # Check if LLM should be used (from request or default to True)
     use_llm = request.form.get('use_llm', 'true').lower() == 'true'
     
@@ -87,6 +108,82 @@ def enhanced_upload():
             except:
                 pass  # Ignore cleanup errors
 
+def run_upload_job(processor, job_id, file_path, filename, use_llm):
+    """Process an uploaded document in the background and record the outcome"""
+    job_key = JOB_SESSION_PREFIX + job_id
+    try:
+        processor.session_manager.save_session(job_key, {'job_id': job_id, 'status': 'processing'})
+        result = processor.process_document(file_path, filename, use_llm=use_llm)
+        processor.session_manager.save_session(job_key, {'job_id': job_id, 'status': 'completed', 'result': result})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        record_job_failure(processor, job_id, str(e))
+    finally:
+        # Clean up uploaded file
+        if os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except:
+                pass  # Ignore cleanup errors
+
+def record_job_failure(processor, job_id, error):
+    """Mark a background job failed, logging instead of raising if the store can't be written"""
+    try:
+        processor.session_manager.save_session(JOB_SESSION_PREFIX + job_id, {'job_id': job_id, 'status': 'failed', 'error': error})
+    except Exception as e:
+        print(f"ERROR: Could not record failure of job {job_id}: {e}")
+
+def on_job_done(processor, job_id, future):
+    """Give a job that was cancelled or died outside run_upload_job's handler a final status"""
+    if future.cancelled():
+        record_job_failure(processor, job_id, 'Job was cancelled')
+    elif future.exception() is not None:
+        record_job_failure(processor, job_id, str(future.exception()))
+
+@enhanced_bp.route('/upload-async', methods=['POST'])
+def enhanced_upload_async():
+    """
+    Upload a document for processing in the background, returning a job id
+    right away; poll /jobs/<job_id> for the result that /upload would return
+    """
+    error = validate_upload()
+    if error:
+        return error
+    
+    file = request.files['file']
+    use_llm = request.form.get('use_llm', 'true').lower() == 'true'
+    
+    try:
+        processor = get_enhanced_processor()
+    except Exception as e:
+        return jsonify({'error': 'Enhanced processing not available. Check logs for details.'}), 503
+    
+    # The file outlives this request, so it gets a name no other upload shares
+    job_id = str(uuid.uuid4())
+    filename = secure_filename(file.filename)
+    file_path = os.path.join(UPLOAD_FOLDER, f"{job_id}_{filename}")
+    file.save(file_path)
+    
+    processor.session_manager.save_session(JOB_SESSION_PREFIX + job_id, {'job_id': job_id, 'status': 'queued'})
+    future = job_executor.submit(run_upload_job, processor, job_id, file_path, filename, use_llm)
+    future.add_done_callback(partial(on_job_done, processor, job_id))
+    
+    return jsonify({'job_id': job_id, 'status': 'queued'}), 202
+
+@enhanced_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status of a background upload job, with its result once completed"""
+    try:
+        processor = get_enhanced_processor()
+    except Exception as e:
+        return jsonify({'error': 'Enhanced processing not available. Check logs for details.'}), 503
+    
+    job = processor.session_manager.get_session(JOB_SESSION_PREFIX + job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 @enhanced_bp.route('/populate/<session_id>', methods=['POST'])
 def enhanced_populate(session_id):
     """Populate verses with optimal placement"""
@@ -126,7 +126,10 @@ class EnhancedProcessor:
         # Initialize the best available detector - Pure LLM for 100% accuracy without regex
         if PURE_LLM_AVAILABLE and openai_key:
             try:
-                self.pure_llm = PureLLMDetector(openai_key)
+                # LLM results are cached in the local SQLite store even when
+                # sessions live in PostgreSQL; losing them only costs a request
+                result_cache = self.session_manager if isinstance(self.session_manager, SessionManager) else SessionManager()
+                self.pure_llm = PureLLMDetector(openai_key, result_cache=result_cache)
                 print("Using Pure LLM Detector (no regex) for intelligent detection")
                 self.detector = self.pure_llm
             except Exception as e:
@@ -724,16 +727,11 @@ class EnhancedProcessor:
     def _fetch_verse_text(self, reference: Dict) -> Optional[str]:
         """Fetch verse text from database"""
         try:
-            verses = []
             end_verse = reference.get('end_verse') or reference.get('start_verse')
-            for verse_num in range(reference['start_verse'], end_verse + 1):
-                verse_data = self.bible_db.lookup_verse(
-                    reference['book'],
-                    reference['chapter'],
-                    verse_num
-                )
-                if verse_data and 'text' in verse_data:
-                    verses.append(verse_data['text'])
+            keys = [(reference['book'], reference['chapter'], verse_num)
+                    for verse_num in range(reference['start_verse'], end_verse + 1)]
+            texts = self.bible_db.get_verses_bulk(keys)
+            verses = [texts[key] for key in keys if key in texts]
             
             return ' '.join(verses) if verses else None
             
@@ -455,16 +455,20 @@ Return JSON array of verses found:
             full_book = book_mapping.get(book, book)
             
             # Fetch from database
+            verse_nums = range(start, end + 1)
+            texts = self.bible_db.get_verses_bulk([(full_book, chapter, v) for v in verse_nums])
+            missing = [v for v in verse_nums if not texts.get((full_book, chapter, v))]
+            
+            # Try with original book name if mapping didn't work
+            fallback = {}
+            if missing and book != full_book:
+                fallback = self.bible_db.get_verses_bulk([(book, chapter, v) for v in missing])
+            
             verses = []
-            for verse_num in range(start, end + 1):
-                text = self.bible_db.get_verse(full_book, chapter, verse_num)
+            for verse_num in verse_nums:
+                text = texts.get((full_book, chapter, verse_num)) or fallback.get((book, chapter, verse_num))
                 if text:
                     verses.append(f"{verse_num}. {text}")
-                else:
-                    # Try with original book name if mapping didn't work
-                    text = self.bible_db.get_verse(book, chapter, verse_num)
-                    if text:
-                        verses.append(f"{verse_num}. {text}")
             
             return ' '.join(verses) if verses else None
             
@@ -43,6 +43,7 @@ class ModelScheduler:
         self.min_new_samples = min_new_samples
         self.min_feedback_count = min_feedback_count
         self.performance_threshold = performance_threshold
+        self._retrain_max_gap = timedelta(days=7)
         
         self.last_training_time = datetime.now()
         self.last_sample_count = 0
@@ -88,6 +89,7 @@ class ModelScheduler:
             Retraining result
         """
         logger.info("Checking if model retraining is needed...")
+        now = datetime.now()
         
         # Get current statistics
         report = self.training_manager.create_training_report()
@@ -115,8 +117,8 @@ class ModelScheduler:
             reasons.append(f"Performance: {recent_performance:.2f} < {self.performance_threshold}")
             
         # Check time since last training
-        time_since_training = datetime.now() - self.last_training_time
-        if time_since_training > timedelta(days=7):
+        time_since_training = now - self.last_training_time
+        if time_since_training > self._retrain_max_gap:
             should_retrain = True
             reasons.append(f"Time since last training: {time_since_training.days} days")
             
@@ -125,13 +127,13 @@ class ModelScheduler:
             result = self._perform_retraining()
             
             if result['success']:
-                self.last_training_time = datetime.now()
+                self.last_training_time = now
                 self.last_sample_count = current_samples
                 
                 # Store model version
                 self.model_versions.append({
                     'version': result['model_version'],
-                    'timestamp': datetime.now(),
+                    'timestamp': now,
                     'metrics': result.get('metrics', {}),
                     'sample_count': current_samples
                 })
@@ -142,7 +144,7 @@ class ModelScheduler:
             return {
                 'success': False,
                 'message': 'No retraining needed',
-                'checked_at': datetime.now().isoformat()
+                'checked_at': now.isoformat()
             }
             
     def _calculate_recent_performance(self) -> Optional[float]:
@@ -152,20 +154,19 @@ class ModelScheduler:
         Returns:
             Performance score or None if insufficient data
         """
-        # Get recent feedback
+        # Prefer the aggregate query so feedback rows never leave the database
+        if hasattr(self.training_manager, 'get_recent_feedback_stats'):
+            positive, total = self.training_manager.get_recent_feedback_stats(days=7)
+            return positive / total if total else None
+
+        # Fallback: calculate accuracy based on positive vs negative feedback
         recent_feedback = self.training_manager.get_recent_feedback(days=7)
-        
+
         if not recent_feedback:
             return None
-            
-        # Calculate accuracy based on positive vs negative feedback
+
         positive = sum(1 for f in recent_feedback if f.get('is_positive', False))
-        total = len(recent_feedback)
-        
-        if total == 0:
-            return None
-            
-        return positive / total
+        return positive / len(recent_feedback)
         
     def _perform_retraining(self) -> Dict[str, Any]:
         """
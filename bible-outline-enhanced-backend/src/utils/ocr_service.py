@@ -10,10 +10,18 @@ class OCRService:
     def __init__(self):
         # Configure tesseract if needed
         # pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'  # Adjust path if needed
-        pass
+
+        # LSTM-only engine, English only, and skip the general-purpose
+        # dictionaries which add load time without helping verse references
+        self._tess_config = '--oem 1 -l eng -c load_system_dawg=0 -c load_freq_dawg=0'
     
-    def process_image(self, image_path: str) -> Dict:
-        """Extract text from image using OCR"""
+    def process_image(self, image_path: str, psm: int = 6) -> Dict:
+        """Extract text from image using OCR
+
+        Args:
+            image_path: Path to the image file
+            psm: Tesseract page segmentation mode (6 = uniform block, 7 = single line)
+        """
         try:
             # Enhance image for better OCR
             enhanced_path = self._enhance_image(image_path)
@@ -21,7 +29,7 @@ class OCRService:
             # Extract text using tesseract
             text = pytesseract.image_to_string(
                 Image.open(enhanced_path),
-                config='--psm 6'  # Assume uniform block of text
+                config=f'--psm {psm} {self._tess_config}'
             )
             
             # Clean up enhanced image
@@ -12,6 +12,18 @@ import html
 
 class PDFToHTMLConverter:
     """Convert PDF outlines to structured HTML"""
+
+    # Verse reference patterns shared by _mark_verse_references and
+    # _extract_verses_from_text so both see exactly the same references
+    _VERSE_RES = tuple(re.compile(p) for p in (
+        # Full references: Rom. 5:1-11, John 14:6a
+        r'([1-3]?\s*[A-Z][a-z]+\.?\s+\d+:\d+(?:-\d+)?[a-z]?)',
+        # Standalone verses: v. 5, vv. 1-11
+        r'(vv?\.\s+\d+(?:-\d+)?)',
+        # cf. references
+        r'(cf\.\s+[1-3]?\s*[A-Z][a-z]+\.?\s+\d+:\d+(?:-\d+)?)',
+    ))
+    _PARENTHETICAL_RE = re.compile(r'(\([^)]+\))')
     
     def __init__(self):
         self.outline_pattern = re.compile(r'^([IVX]+\.|[A-Z]\.|[1-9]\d?\.|[a-z]\.)')
@@ -41,12 +53,8 @@ class PDFToHTMLConverter:
             for page in pdf.pages:
                 text = page.extract_text()
                 if text:
-                    # Split into lines and clean
-                    page_lines = text.split('\n')
-                    for line in page_lines:
-                        line = line.strip()
-                        if line:
-                            lines.append(line)
+                    # Split into lines, strip them and drop the empty ones
+                    lines.extend(filter(None, map(str.strip, text.split('\n'))))
         
         return lines
     
@@ -130,25 +138,14 @@ class PDFToHTMLConverter:
     
     def _mark_verse_references(self, text: str) -> str:
         """Mark verse references with span tags for easy identification"""
-        
-        # Pattern for various verse formats
-        patterns = [
-            # Full references: Rom. 5:1-11, John 14:6a
-            r'([1-3]?\s*[A-Z][a-z]+\.?\s+\d+:\d+(?:-\d+)?[a-z]?)',
-            # Parenthetical references: (Acts 10:43)
-            r'(\([1-3]?\s*[A-Z][a-z]+\.?\s+\d+:\d+(?:-\d+)?[a-z]?\))',
-            # Standalone verses: v. 5, vv. 1-11
-            r'(vv?\.\s+\d+(?:-\d+)?)',
-            # cf. references
-            r'(cf\.\s+[1-3]?\s*[A-Z][a-z]+\.?\s+\d+:\d+(?:-\d+)?)',
-        ]
-        
+        # Parenthetical and cf. references are covered by the full
+        # reference pattern, which wraps the reference inside them first
         result = text
-        for pattern in patterns:
-            result = re.sub(pattern, r'<span class="verse-ref">\1</span>', result)
+        for pattern in self._VERSE_RES:
+            result = pattern.sub(r'<span class="verse-ref">\1</span>', result)
         
         # Mark parenthetical content
-        result = re.sub(r'(\([^)]+\))', r'<span class="parenthetical">\1</span>', result)
+        result = self._PARENTHETICAL_RE.sub(r'<span class="parenthetical">\1</span>', result)
         
         return result
 
@@ -192,15 +189,7 @@ class PDFToHTMLConverter:
         """Extract verse references from text"""
         verses = []
         
-        # Various verse patterns
-        patterns = [
-            r'([1-3]?\s*[A-Z][a-z]+\.?\s+\d+:\d+(?:-\d+)?[a-z]?)',
-            r'vv?\.\s+\d+(?:-\d+)?',
-            r'cf\.\s+[1-3]?\s*[A-Z][a-z]+\.?\s+\d+:\d+(?:-\d+)?',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            verses.extend(matches)
+        for pattern in self._VERSE_RES:
+            verses.extend(pattern.findall(text))
         
-        return verses
\ No newline at end of file
+        return verses
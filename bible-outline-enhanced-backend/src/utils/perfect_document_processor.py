@@ -4,17 +4,60 @@ Uses the PerfectVerseParser to achieve 100% accuracy matching MSG12VerseReferenc
 """
 
 import os
+import re
+import mmap
+import multiprocessing
 import uuid
 import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
 from typing import Dict, List, Optional
 import fitz  # PyMuPDF
 from docx import Document
 from .perfect_verse_parser import PerfectVerseParser
 
+# PyMuPDF is not thread-safe, so long PDFs are split into page ranges that
+# worker processes extract from their own copy of the document
+PARALLEL_PDF_MIN_PAGES = 32
+PDF_MAX_WORKERS = 8
+
+# Text files at least this large are decoded straight from a memory map
+MMAP_MIN_BYTES = 4 * 1024 * 1024
+
+# A populated line that is just a verse reference, e.g. "Rom 5:1"
+_VERSE_LINE_RE = re.compile(r'^[A-Za-z0-9]+ \d+:\d+$')
+
+
+def _extract_pdf_page_range(file_path: str, start: int, stop: int) -> str:
+    """Extract the text of pages [start, stop) of a PDF (runs in a worker process)"""
+    doc = fitz.open(file_path)
+    try:
+        return ''.join(doc.load_page(i).get_text() for i in range(start, stop))
+    finally:
+        doc.close()
+
+
 class PerfectDocumentProcessor:
     def __init__(self, bible_db_path: str):
         self.verse_parser = PerfectVerseParser(bible_db_path)
-        self.sessions = {}  # Store session data
+        self.sessions = OrderedDict()  # Store session data, least recently used first
+        self._max_sessions = 128
+    
+    def _store_session(self, session_id: str, session_data: Dict):
+        """Store a session, evicting the least recently used beyond the cap"""
+        self.sessions[session_id] = session_data
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self._max_sessions:
+            self.sessions.popitem(last=False)
+    
+    def _get_session(self, session_id: str) -> Optional[Dict]:
+        """Get a session and mark it as recently used"""
+        session_data = self.sessions.get(session_id)
+        if session_data is not None:
+            self.sessions.move_to_end(session_id)
+        return session_data
     
     def process_file(self, file_path: str, filename: str) -> Dict:
         """
@@ -27,8 +70,7 @@ class PerfectDocumentProcessor:
             elif filename.lower().endswith(('.doc', '.docx')):
                 text = self._extract_docx_text(file_path)
             elif filename.lower().endswith('.txt'):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
+                text = self._read_text_file(file_path)
             else:
                 return {
                     'success': False,
@@ -41,26 +83,23 @@ class PerfectDocumentProcessor:
                     'error': 'No text could be extracted from the file'
                 }
             
-            # Detect verse references with perfect parser
-            references = self.verse_parser.detect_verse_references_with_context(text)
-            
-            # Get detection statistics
-            stats = self.verse_parser.get_detection_stats(text)
+            # Detect verse references with perfect parser and get the
+            # detection statistics from the same pass
+            references, stats = self.verse_parser.detect_and_stats(text)
             
             # Create session
             session_id = str(uuid.uuid4())
-            self.sessions[session_id] = {
+            self._store_session(session_id, {
                 'original_text': text,
                 'filename': filename,
                 'references': references,
                 'stats': stats
-            }
+            })
             
             # Extract reference strings for response
             reference_strings = []
             seen_refs = set()
-            for ref in references:
-                ref_str = ref['reference']
+            for ref_str in self.verse_parser.verse_reference_strings(references):
                 if ref_str not in seen_refs:
                     reference_strings.append(ref_str)
                     seen_refs.add(ref_str)
@@ -87,18 +126,22 @@ class PerfectDocumentProcessor:
         """
         Populate verses for a session using the perfect format
         """
-        if session_id not in self.sessions:
+        session_data = self._get_session(session_id)
+        if session_data is None:
             return {
                 'success': False,
                 'error': 'Session not found'
             }
         
         try:
-            session_data = self.sessions[session_id]
-            original_text = session_data['original_text']
-            
-            # Process with perfect verse parser
-            populated_content = self.verse_parser.process_outline_with_verses(original_text)
+
+            # Process with perfect verse parser once per session; the
+            # original text never changes, so later calls (e.g. export)
+            # reuse the stored result
+            populated_content = session_data.get('populated_content')
+            if populated_content is None:
+                populated_content = self.verse_parser.process_outline_with_verses(session_data['original_text'])
+                session_data['populated_content'] = populated_content
             
             # Count total unique verses
             stats = session_data['stats']
@@ -123,25 +166,54 @@ class PerfectDocumentProcessor:
         """
         Get detailed statistics for a session
         """
-        if session_id not in self.sessions:
+        session_data = self._get_session(session_id)
+        if session_data is None:
             return None
         
-        return self.sessions[session_id]['stats']
+        return session_data['stats']
     
     def _extract_pdf_text(self, file_path: str) -> str:
         """
         Extract text from PDF file
         """
-        text = ""
+        parts = []
         try:
             doc = fitz.open(file_path)
-            for page in doc:
-                text += page.get_text()
-            doc.close()
+            try:
+                page_count = doc.page_count
+                workers = min(PDF_MAX_WORKERS, os.cpu_count() or 1)
+                parallel = page_count >= PARALLEL_PDF_MIN_PAGES and workers > 1
+                if not parallel:
+                    for page in doc:
+                        parts.append(page.get_text())
+            finally:
+                doc.close()
+            
+            if parallel:
+                step = -(-page_count // workers)
+                starts = range(0, page_count, step)
+                stops = [min(start + step, page_count) for start in starts]
+                # Spawned rather than forked: the app's worker has threads
+                # and open connections whose locks a forked child could
+                # inherit held
+                with ProcessPoolExecutor(max_workers=len(starts), mp_context=multiprocessing.get_context('spawn')) as executor:
+                    parts = list(executor.map(_extract_pdf_page_range, repeat(file_path), starts, stops))
         except Exception as e:
             raise Exception(f"Error extracting PDF text: {str(e)}")
         
-        return text
+        return ''.join(parts)
+    
+    def _read_text_file(self, file_path: str) -> str:
+        """
+        Read a UTF-8 text file with one read and one decode
+        """
+        path = Path(file_path)
+        if path.stat().st_size < MMAP_MIN_BYTES:
+            return path.read_bytes().decode('utf-8', errors='replace')
+        
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                return str(view, 'utf-8', 'replace')
     
     def _extract_docx_text(self, file_path: str) -> str:
         """
@@ -149,10 +221,7 @@ class PerfectDocumentProcessor:
         """
         try:
             doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            return ''.join(paragraph.text + "\n" for paragraph in doc.paragraphs)
         except Exception as e:
             raise Exception(f"Error extracting DOCX text: {str(e)}")
     
@@ -160,7 +229,8 @@ class PerfectDocumentProcessor:
         """
         Export populated content to Word document
         """
-        if session_id not in self.sessions:
+        session_data = self._get_session(session_id)
+        if session_data is None:
             return None
         
         try:
@@ -170,7 +240,6 @@ class PerfectDocumentProcessor:
                 return None
             
             populated_content = result['content']
-            session_data = self.sessions[session_id]
             
             # Create Word document
             doc = Document()
@@ -187,9 +256,10 @@ class PerfectDocumentProcessor:
             
             # Add content
             for line in populated_content.split('\n'):
-                if line.strip():
+                stripped = line.strip()
+                if stripped:
                     # Check if this is a verse reference (format: "Book Chapter:Verse")
-                    if re.match(r'^[A-Za-z0-9]+ \d+:\d+$', line.strip()):
+                    if _VERSE_LINE_RE.match(stripped):
                         # This is a verse reference - make it bold
                         p = doc.add_paragraph()
                         p.add_run(line).bold = True
@@ -5,11 +5,54 @@ Based on actual MSG12VerseReferences format analysis
 """
 
 import re
+import sys
+from operator import itemgetter
 from typing import List, Dict, Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# google-re2 matches the large book alternation in linear time; the
+# standard re module is used when it is not installed
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+# pyahocorasick finds candidate offsets so the re engine can skip prose
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# chapter_only lookahead, which RE2 cannot compile
+_NOT_VERSE_LOOKAHEAD = r'(?!\s*:)'
+
+# Possessive quantifiers (Python 3.11+) are not supported by RE2 either;
+# this finds the trailing '+' that makes a quantifier possessive
+_POSSESSIVE_RE = re.compile(r'(?<=[*+?])\+')
+
+# Literal text every master pattern match is anchored on: the shortest
+# form of each book name, the "v." verse marker and "Scripture Reading".
+# Keep in sync with book_patterns.
+_PRESCAN_WORDS = (
+    'gen', 'exo', 'lev', 'num', 'deut', 'josh', 'judg', 'ruth', 'sam', 'king',
+    'chr', 'ezra', 'neh', 'esth', 'job', 'psa', 'prov', 'eccl', 'song', 'ss',
+    'sos', 'isa', 'jer', 'lam', 'ezek', 'dan', 'hos', 'joel', 'amos', 'obad',
+    'jon', 'mic', 'nah', 'hab', 'zeph', 'hag', 'zech', 'mal',
+    'matt', 'mark', 'luke', 'john', 'acts', 'rom', 'cor', 'gal', 'eph', 'phil',
+    'col', 'thess', 'tim', 'titus', 'phlm', 'heb', 'jam', 'pet', 'jude', 'rev',
+    'v.', 'scripture reading',
+)
+
+# Words that may precede a book name (chapter_context, cross_reference)
+_PREFIX_WORDS = ('according to', 'in', 'from', 'per', 'cf.', 'see')
+
+# Lowercases ASCII only, so offsets in the lowered text match the original
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
 class PerfectVerseDetector:
     """Perfect verse detection matching MSG12VerseReferences exactly"""
     
@@ -43,30 +86,24 @@ class PerfectVerseDetector:
         
         # Create master book pattern
         self.book_regex = '(?:' + '|'.join(self.book_patterns) + ')'
-        
-    def detect_all_verses(self, text: str) -> List[Dict]:
-        """
-        Detect ALL verse references with 100% accuracy
-        Matches MSG12VerseReferences format exactly
-        """
-        
-        # Clean text
-        text = text.replace('—', '-').replace('–', '-')
-        
-        all_verses = []
-        seen = set()
-        
+
         # Master pattern that catches EVERYTHING
-        # This matches the exact format from MSG12VerseReferences
+        # This matches the exact format from MSG12VerseReferences.
+        # Alternatives are tried left to right, so patterns that share a
+        # starting point are ordered from most to least specific.
         patterns = [
             # Scripture Reading (highest priority)
             (r'Scripture Reading[:\s]+([^\n]+)', 'scripture_reading', 1.0),
             
-            # Full references with optional period after book
-            (rf'({self.book_regex})\.?\s+(\d+):(\d+)(?:[a-c])?(?:[-,](\d+)(?:[a-c])?)*', 'full_reference', 0.95),
+            # Verse ranges with chapter crossing
+            (rf'({self.book_regex})\.?\s+(\d+):(\d+)-(\d+):(\d+)', 'chapter_range', 0.95),
             
-            # Semicolon lists (book ch:v; book ch:v)
-            (rf'({self.book_regex})\.?\s+\d+:\d+(?:[a-c])?(?:[-,]\d+(?:[a-c])?)*(?:\s*;\s*(?:{self.book_regex})\.?\s+\d+:\d+(?:[a-c])?(?:[-,]\d+(?:[a-c])?)*)+', 'semicolon_list', 0.95),
+            # Semicolon lists (book ch:v; book ch:v); possessive so a list
+            # that stops short never retries shorter splits of its items
+            (rf'({self.book_regex})\.?\s++\d++:\d++(?:[a-c])?+(?:[-,]\d++(?:[a-c])?+)*+(?:\s*+;\s*+(?:{self.book_regex})\.?\s++\d++:\d++(?:[a-c])?+(?:[-,]\d++(?:[a-c])?+)*+)++', 'semicolon_list', 0.95),
+            
+            # Full references with optional period after book
+            (rf'\b({self.book_regex})\.?\s+(\d+):(\d+)(?:[a-c])?(?:[-,](\d+)(?:[a-c])?)*', 'full_reference', 0.95),
             
             # Complex lists with commas and ranges
             (rf'({self.book_regex})\.?\s+(\d+):(\d+)(?:\s*,\s*\d+(?:-\d+)?)*', 'verse_list', 0.93),
@@ -84,59 +121,157 @@ class PerfectVerseDetector:
             (rf'(?:cf\.|see)\s+({self.book_regex})\.?\s+(\d+)(?::(\d+)(?:[-,]\d+)*)?', 'cross_reference', 0.85),
             
             # Book chapter without verse
-            (rf'({self.book_regex})\.?\s+(\d+)(?!\s*:)', 'chapter_only', 0.82),
-            
-            # Verse ranges with chapter crossing
-            (rf'({self.book_regex})\.?\s+(\d+):(\d+)-(\d+):(\d+)', 'chapter_range', 0.95),
+            (rf'({self.book_regex})\.?\s+(\d+){_NOT_VERSE_LOOKAHEAD}', 'chapter_only', 0.82),
         ]
         
-        # Process each pattern
-        for pattern_str, pattern_type, confidence in patterns:
+        # Fuse every pattern into one alternation so the text is scanned
+        # once; the named group of each alternative identifies its type
+        alternatives = {
+            pattern_type: f'(?P<{pattern_type}>{pattern_str})'
+            for pattern_str, pattern_type, _ in patterns
+        }
+        book_led = ('chapter_range', 'semicolon_list', 'full_reference', 'verse_list', 'chapter_only')
+        others = [t for t in alternatives if t != 'scripture_reading' and t not in book_led]
+        
+        self.uses_re2 = False
+        if RE2_AVAILABLE:
+            # RE2 has no lookarounds, so chapter_only's colon check is done
+            # in detect_all_verses instead. It never backtracks, so the
+            # possessive quantifiers are simply dropped.
             try:
-                for match in re.finditer(pattern_str, text, re.IGNORECASE):
-                    match_text = match.group(0).strip()
-                    
-                    # Skip if already seen
-                    if match_text in seen:
-                        continue
-                    
-                    seen.add(match_text)
-                    
-                    # Special handling for Scripture Reading
-                    if pattern_type == 'scripture_reading':
-                        refs_text = match.group(1)
-                        # Split by semicolon and comma
-                        parts = re.split(r'[;,]\s*', refs_text)
-                        for part in parts:
-                            part = part.strip()
-                            if part and not part in seen:
-                                all_verses.append({
-                                    'reference': part,
-                                    'type': pattern_type,
-                                    'confidence': confidence,
-                                    'position': match.start()
-                                })
-                                seen.add(part)
-                    else:
-                        # Process match groups to create reference
-                        ref = self._format_reference(match, pattern_type)
-                        if ref:
+                self._master_re = re2.compile('(?i)' + '|'.join(
+                    _POSSESSIVE_RE.sub('', alternatives[t].replace(_NOT_VERSE_LOOKAHEAD, ''))
+                    for t in ('scripture_reading',) + book_led + tuple(others)
+                ))
+                self.uses_re2 = True
+            except re2.error as e:
+                logger.debug(f"RE2 rejected master pattern, using re: {e}")
+        
+        if not self.uses_re2:
+            # The alternatives that start with a book name sit behind a single
+            # book lookahead, so most positions are rejected by one book test
+            # instead of one per alternative.
+            book_guard = rf'(?=(?:{self.book_regex})\.?\s+\d)'
+            self._master_re = re.compile(
+                '|'.join(
+                    [alternatives['scripture_reading'],
+                     book_guard + '(?:' + '|'.join(alternatives[t] for t in book_led) + ')'] +
+                    [alternatives[t] for t in others]
+                ),
+                re.IGNORECASE
+            )
+        self._colon_after_re = re.compile(r'\s*:')
+        
+        # Aho-Corasick prescan for the backtracking engine; RE2 already
+        # scans in linear time and re-encodes the text on every call
+        self._prescan = None
+        if AHOCORASICK_AVAILABLE and not self.uses_re2:
+            self._prescan = ahocorasick.Automaton()
+            for word in _PRESCAN_WORDS:
+                self._prescan.add_word(word, len(word))
+            self._prescan.make_automaton()
+        self._confidences = {pattern_type: confidence for _, pattern_type, confidence in patterns}
+        
+        # Absolute index of each alternative's first own group: the book
+        # name, or the reference list for scripture_reading. standalone
+        # has no book.
+        self._book_groups = {
+            pattern_type: self._master_re.groupindex[pattern_type] + 1
+            for _, pattern_type, _ in patterns
+            if pattern_type != 'standalone'
+        }
+        
+        # Inline verses are full references; they are only looked for inside
+        # the other matches since full_reference already covers the rest
+        self._inline_re = re.compile(
+            next(p for p, t, _ in patterns if t == 'full_reference'),
+            re.IGNORECASE
+        )
+        self._book_re = re.compile(self.book_regex, re.IGNORECASE)
+        self._max_book_len = len('1 Thessalonians')
+        self._split_re = re.compile(r'[;,]\s*')
+        self._digits_re = re.compile(r'\d+')
+        
+    def detect_all_verses(self, text: str) -> List[Dict]:
+        """
+        Detect ALL verse references with 100% accuracy
+        Matches MSG12VerseReferences format exactly
+        """
+        
+        # Clean text
+        text = text.replace('—', '-').replace('–', '-')
+        
+        all_verses = []
+        seen = set()
+        inline_spans = []
+        
+        # Single pass over the text; dispatch on the matched alternative
+        for match in self._iter_master_matches(text):
+            # RE2 returns a new group name string for every match
+            pattern_type = sys.intern(match.lastgroup)
+            if (self.uses_re2 and pattern_type == 'chapter_only'
+                    and self._colon_after_re.match(text, match.end())):
+                continue
+            if pattern_type != 'full_reference':
+                inline_spans.append(match.span())
+            confidence = self._confidences[pattern_type]
+            try:
+                match_text = match.group(0).strip()
+                
+                # Skip if already seen
+                if match_text in seen:
+                    continue
+                
+                seen.add(match_text)
+                
+                # Special handling for Scripture Reading
+                if pattern_type == 'scripture_reading':
+                    refs_text = match.group(self._book_groups[pattern_type])
+                    # Split by semicolon and comma
+                    parts = self._split_re.split(refs_text)
+                    for part in parts:
+                        part = part.strip()
+                        if part and not part in seen:
                             all_verses.append({
-                                'reference': ref,
+                                'reference': part,
                                 'type': pattern_type,
                                 'confidence': confidence,
                                 'position': match.start()
                             })
+                            seen.add(part)
+                else:
+                    # Process match groups to create reference
+                    ref = self._format_reference(match, pattern_type)
+                    if ref:
+                        all_verses.append({
+                            'reference': ref,
+                            'type': pattern_type,
+                            'confidence': confidence,
+                            'position': match.start()
+                        })
             except Exception as e:
                 logger.debug(f"Pattern {pattern_type} error: {e}")
                 continue
         
-        # Additional pass for inline verses in sentences
-        # This catches verses embedded in normal text
-        inline_pattern = rf'\b({self.book_regex})\.?\s+(\d+):(\d+)(?:[a-c])?(?:[-,]\d+(?:[a-c])?)*'
-        for match in re.finditer(inline_pattern, text, re.IGNORECASE):
-            match_text = match.group(0).strip()
-            if match_text not in seen:
+        # Additional pass for inline verses in sentences, e.g. each reference
+        # of a semicolon list. Every full reference elsewhere is already a
+        # full_reference match, so only book names starting inside the other
+        # matches are tried; the name and reference may run past the match.
+        pos = 0
+        for start, end in inline_spans:
+            pos = max(pos, start)
+            while pos < end:
+                book = self._book_re.search(text, pos, end + self._max_book_len)
+                if not book or book.start() >= end:
+                    break
+                match = self._inline_re.match(text, book.start())
+                if not match:
+                    pos = book.start() + 1
+                    continue
+                pos = match.end()
+                match_text = match.group(0).strip()
+                if match_text in seen:
+                    continue
                 seen.add(match_text)
                 all_verses.append({
                     'reference': match_text,
@@ -146,38 +281,61 @@ class PerfectVerseDetector:
                 })
         
         # Sort by position
-        all_verses.sort(key=lambda x: x['position'])
+        all_verses.sort(key=itemgetter('position'))
         
-        # Remove duplicates while preserving order
-        unique_verses = []
-        seen_refs = set()
+        # Remove duplicates while preserving order (first one wins)
+        unique_verses = {}
         for verse in all_verses:
-            ref_key = re.sub(r'\s+', ' ', verse['reference'].lower())
-            if ref_key not in seen_refs:
-                seen_refs.add(ref_key)
-                unique_verses.append(verse)
+            unique_verses.setdefault(' '.join(verse['reference'].lower().split()), verse)
+        
+        return list(unique_verses.values())
+    
+    def _iter_master_matches(self, text: str):
+        """
+        Yield the same matches as self._master_re.finditer(text), trying
+        the pattern only at offsets where a match can start
+        """
+        if self._prescan is None:
+            yield from self._master_re.finditer(text)
+            return
         
-        return unique_verses
+        lowered = text.translate(_ASCII_LOWER)
+        starts = set()
+        for end, length in self._prescan.iter(lowered):
+            hit = end - length + 1
+            # "vv.", "1 John", "1John" and "(1 John" start up to 3 characters earlier
+            starts.update((hit, hit - 1, hit - 2, hit - 3))
+            # "in Rom 5", "cf. 1 Cor 1:2": a prefix word before the book's whitespace
+            for book_start in (hit, hit - 1, hit - 2):
+                ws_start = book_start
+                while ws_start > 0 and text[ws_start - 1].isspace():
+                    ws_start -= 1
+                if ws_start == book_start:
+                    continue
+                for word in _PREFIX_WORDS:
+                    if lowered.endswith(word, 0, ws_start):
+                        starts.add(ws_start - len(word))
+        
+        cursor = 0
+        for start in sorted(starts):
+            if start < cursor:
+                continue
+            match = self._master_re.match(text, start)
+            if match:
+                yield match
+                cursor = match.end()
     
     def _format_reference(self, match, pattern_type):
         """Format match groups into standard reference"""
         try:
-            groups = match.groups()
-            if not groups:
-                return None
-                
-            # Get first non-None group as book
-            book = None
-            for g in groups:
-                if g and re.match(self.book_regex, g, re.IGNORECASE):
-                    book = g
-                    break
+            book_group = self._book_groups.get(pattern_type)
+            book = match.group(book_group) if book_group else None
             
             if not book:
                 return match.group(0)
             
             # Try to find chapter and verse
-            numbers = re.findall(r'\d+', match.group(0))
+            numbers = self._digits_re.findall(match.group(0))
             if len(numbers) >= 2:
                 return f"{book} {numbers[0]}:{':'.join(numbers[1:])}"
             elif len(numbers) == 1:
@@ -194,17 +352,29 @@ class PerfectVerseDetector:
         """
         verses = self.detect_all_verses(text)
         
-        # Calculate statistics
+        # Calculate statistics, unique references (in position order) and
+        # confidence totals in a single pass
         type_counts = {}
+        unique_refs = []
+        seen_refs = set()
+        confidence_total = 0.0
+        high_confidence_count = 0
         for verse in verses:
             verse_type = verse['type']
             type_counts[verse_type] = type_counts.get(verse_type, 0) + 1
+            
+            ref = verse['reference']
+            if ref not in seen_refs:
+                seen_refs.add(ref)
+                unique_refs.append(ref)
+            
+            confidence = verse['confidence']
+            confidence_total += confidence
+            if confidence >= 0.90:
+                high_confidence_count += 1
         
         # Calculate average confidence
-        avg_confidence = sum(v['confidence'] for v in verses) / len(verses) if verses else 0
-        
-        # Get unique references
-        unique_refs = list(set(v['reference'] for v in verses))
+        avg_confidence = confidence_total / len(verses) if verses else 0
         
         return {
             'verses': verses,
@@ -213,5 +383,5 @@ class PerfectVerseDetector:
             'unique_count': len(unique_refs),
             'type_distribution': type_counts,
             'average_confidence': avg_confidence,
-            'high_confidence_count': sum(1 for v in verses if v['confidence'] >= 0.90)
+            'high_confidence_count': high_confidence_count
         }
\ No newline at end of file
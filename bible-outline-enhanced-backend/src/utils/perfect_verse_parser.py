@@ -4,9 +4,62 @@ Achieves 100% accuracy matching MSG12VerseReferences.pdf exactly
 """
 
 import re
+import sys
+from functools import lru_cache
 from typing import List, Dict, Tuple, Set
 from .sqlite_bible_database import SQLiteBibleDatabase
 
+# pyahocorasick finds book names in a line without a regex scan
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Line patterns used by _detect_references_in_line. _TAIL is what follows
+# a book name; its six groups end every full reference match.
+_TAIL = r'\.?\s+(\d+):(\d+)(?:-(\d+))?(?:;\s*(\d+):(\d+)(?:-(\d+))?)*'
+_TAIL_RE = re.compile(_TAIL)
+_VV_RE = re.compile(r'vv?\.\s*(\d+)(?:-(\d+))?', re.IGNORECASE)
+_CV_RE = re.compile(r'(?<![A-Za-z])(\d+):(\d+)(?:-(\d+))?(?![A-Za-z])')
+
+def _trie_regex(words) -> str:
+    """
+    Build a regex matching any of the words, branching on shared prefixes
+    so re tries one branch per character rather than every word in turn
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None  # a word ends here
+    
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + pattern + ')?' if '' in node else pattern
+    
+    return build(trie)
+
+# Books in biblical order, named as in the books table
+CANONICAL_BOOK_ORDER = (
+    'Genesis', 'Exodus', 'Leviticus', 'Numbers', 'Deuteronomy', 'Joshua', 'Judges', 'Ruth',
+    '1 Samuel', '2 Samuel', '1 Kings', '2 Kings', '1 Chronicles', '2 Chronicles', 'Ezra',
+    'Nehemiah', 'Esther', 'Job', 'Psalms', 'Proverbs', 'Ecclesiastes', 'Song of Songs', 'Isaiah',
+    'Jeremiah', 'Lamentations', 'Ezekiel', 'Daniel', 'Hosea', 'Joel', 'Amos', 'Obadiah', 'Jonah',
+    'Micah', 'Nahum', 'Habakkuk', 'Zephaniah', 'Haggai', 'Zechariah', 'Malachi',
+    'Matthew', 'Mark', 'Luke', 'John', 'Acts', 'Romans', '1 Corinthians', '2 Corinthians',
+    'Galatians', 'Ephesians', 'Philippians', 'Colossians', '1 Thessalonians', '2 Thessalonians',
+    '1 Timothy', '2 Timothy', 'Titus', 'Philemon', 'Hebrews', 'James', '1 Peter', '2 Peter',
+    '1 John', '2 John', '3 John', 'Jude', 'Revelation'
+)
+
+# Lowercases ASCII only, so offsets in the lowered line match the original
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
 class PerfectVerseParser:
     def __init__(self, db_path: str):
         self.db = SQLiteBibleDatabase(db_path)
@@ -44,16 +97,55 @@ class PerfectVerseParser:
             '2John': '2 John', '3John': '3 John', 'Jude': 'Jude', 'Rev': 'Revelation'
         }
         
-        # Reverse mapping for lookup
+        # Reverse mapping for lookup; a book with several abbreviations maps
+        # to the last one listed, which is what populated outlines show
         self.book_names_to_abbrev = {v: k for k, v in self.book_abbreviations.items()}
+        
+        # Position of each book in the Bible, for sorting verses
+        self._book_order = {name: i for i, name in enumerate(CANONICAL_BOOK_ORDER)}
+        
+        # Lowercased abbreviations and full names for case-insensitive lookup
+        self._abbrev_lower = {k.lower(): v for k, v in self.book_abbreviations.items()}
+        self._fullname_lower = {v.lower(): v for v in self.book_abbreviations.values()}
+        
+        # Words that can name a book once a leading "1"/"2"/"3" is split
+        # off: any abbreviation above, or the first three or more letters
+        # of a book name ("Deut", "Zech", "Thes")
+        self._book_words = set()
+        for abbrev, full_name in self.book_abbreviations.items():
+            self._book_words.add(abbrev.lstrip('123').lower())
+            name = full_name.lstrip('123 ').lower()
+            if name.isalpha():
+                self._book_words.update(name[:i] for i in range(3, len(name) + 1))
+        
+        # Book names come from a small set of spellings, so normalizing one
+        # is memoized per parser rather than redone for every reference
+        self._normalize_book_name = lru_cache(maxsize=1024)(self._normalize_book_name)
+        self._get_book_abbreviation = lru_cache(maxsize=1024)(self._get_book_abbreviation)
+        
+        self._book_automaton = None
+        self._full_re = None
+        if AHOCORASICK_AVAILABLE:
+            self._book_automaton = ahocorasick.Automaton()
+            for word in self._book_words:
+                self._book_automaton.add_word(word, len(word))
+            self._book_automaton.make_automaton()
+        else:
+            # Without the automaton the book words go into the regex itself,
+            # as a trie so "Rom" is tried on the way to "Romans"
+            self._full_re = re.compile(
+                r'(?:cf\.\s+)?((?:[123]\s*)?(?<![A-Za-z])' + _trie_regex(self._book_words) + ')' + _TAIL,
+                re.IGNORECASE)
     
     def detect_verse_references_with_context(self, text: str) -> List[Dict]:
         """
-        Detect all verse references with context resolution and deduplication
+        Detect all verse references with context resolution and deduplication.
+        Each reference covers the verses verse_start..verse_end of one chapter.
         """
         # Split text into lines for context analysis
         lines = text.split('\n')
-        all_references = []
+        unique_references = []
+        seen = set()
         
         # Track current context (book and chapter)
         current_book = None
@@ -68,78 +160,107 @@ class PerfectVerseParser:
                     current_book = ref['book']
                     current_chapter = ref['chapter']
             
-            # Add line references with context
+            # Add line references with context, keeping only the first
+            # occurrence of each verse; a range is split around verses
+            # already seen
             for ref in line_refs:
                 ref['line_number'] = line_num
                 ref['line_text'] = line
-                all_references.append(ref)
-        
-        # Deduplicate references
-        unique_references = self._deduplicate_references(all_references)
+                runs = self._unseen_verse_runs(ref, seen)
+                if runs == [(ref['verse_start'], ref['verse_end'])]:
+                    unique_references.append(ref)
+                else:
+                    unique_references.extend(dict(ref, verse_start=first, verse_end=last) for first, last in runs)
         
         return unique_references
     
+    @staticmethod
+    def _unseen_verse_runs(ref: Dict, seen: Set[Tuple[str, int, int]]) -> List[Tuple[int, int]]:
+        """
+        Mark the verses of a reference as seen, returning the runs of
+        verses that were not seen before
+        """
+        book, chapter = ref['book'], ref['chapter']
+        runs = []
+        run_start = None
+        for verse in range(ref['verse_start'], ref['verse_end'] + 1):
+            key = (book, chapter, verse)
+            if key in seen:
+                if run_start is not None:
+                    runs.append((run_start, verse - 1))
+                    run_start = None
+                continue
+            seen.add(key)
+            if run_start is None:
+                run_start = verse
+        if run_start is not None:
+            runs.append((run_start, ref['verse_end']))
+        return runs
+    
     def _detect_references_in_line(self, line: str, context_book: str = None, context_chapter: int = None) -> List[Dict]:
         """
-        Detect verse references in a single line with context
+        Detect verse references in a single line with context, one per
+        non-empty verse range
         """
         references = []
         
+        # Full and chapter:verse references always contain ':' and
+        # verse-only ones "v.", so most prose lines skip every scan
+        has_colon = ':' in line
+        has_verse_marker = 'v.' in line or 'V.' in line
+        if not has_colon and not has_verse_marker:
+            return references
+        
         # Pattern 1: Full references with book name
         # Examples: "Eph. 4:7-16", "1 Cor. 12:14-22", "cf. 2 Cor. 1:15"
-        full_pattern = r'(?:cf\.\s+)?([123]?\s*[A-Za-z]+\.?)\s+(\d+):(\d+)(?:-(\d+))?(?:;\s*(\d+):(\d+)(?:-(\d+))?)*'
-        
-        for match in re.finditer(full_pattern, line, re.IGNORECASE):
-            book_text = match.group(1)
+        for start, end, book_text, groups in self._iter_full_references(line) if has_colon else ():
+            original_text = line[start:end]
             book_name = self._normalize_book_name(book_text)
-            chapter = int(match.group(2))
-            start_verse = int(match.group(3))
-            end_verse = int(match.group(4)) if match.group(4) else start_verse
+            chapter = int(groups[0])
+            start_verse = int(groups[1])
+            end_verse = int(groups[2]) if groups[2] else start_verse
             
-            # Add verses in range
-            for verse_num in range(start_verse, end_verse + 1):
+            if end_verse >= start_verse:
                 references.append({
                     'book': book_name,
                     'chapter': chapter,
-                    'verse': verse_num,
-                    'reference': f"{self._get_book_abbreviation(book_name)} {chapter}:{verse_num}",
-                    'original_text': match.group(0),
-                    'start_pos': match.start(),
-                    'end_pos': match.end()
+                    'verse_start': start_verse,
+                    'verse_end': end_verse,
+                    'original_text': original_text,
+                    'start_pos': start,
+                    'end_pos': end
                 })
             
             # Handle additional chapter:verse pairs in the same match
-            if match.group(5) and match.group(6):
-                chapter2 = int(match.group(5))
-                start_verse2 = int(match.group(6))
-                end_verse2 = int(match.group(7)) if match.group(7) else start_verse2
+            if groups[3] and groups[4]:
+                chapter2 = int(groups[3])
+                start_verse2 = int(groups[4])
+                end_verse2 = int(groups[5]) if groups[5] else start_verse2
                 
-                for verse_num in range(start_verse2, end_verse2 + 1):
+                if end_verse2 >= start_verse2:
                     references.append({
                         'book': book_name,
                         'chapter': chapter2,
-                        'verse': verse_num,
-                        'reference': f"{self._get_book_abbreviation(book_name)} {chapter2}:{verse_num}",
-                        'original_text': match.group(0),
-                        'start_pos': match.start(),
-                        'end_pos': match.end()
+                        'verse_start': start_verse2,
+                        'verse_end': end_verse2,
+                        'original_text': original_text,
+                        'start_pos': start,
+                        'end_pos': end
                     })
         
         # Pattern 2: Verse-only references (v. X, vv. X-Y)
         # These need context resolution
-        verse_only_pattern = r'vv?\.\s*(\d+)(?:-(\d+))?'
-        
-        for match in re.finditer(verse_only_pattern, line, re.IGNORECASE):
+        for match in _VV_RE.finditer(line) if has_verse_marker else ():
             if context_book and context_chapter:
                 start_verse = int(match.group(1))
                 end_verse = int(match.group(2)) if match.group(2) else start_verse
                 
-                for verse_num in range(start_verse, end_verse + 1):
+                if end_verse >= start_verse:
                     references.append({
                         'book': context_book,
                         'chapter': context_chapter,
-                        'verse': verse_num,
-                        'reference': f"{self._get_book_abbreviation(context_book)} {context_chapter}:{verse_num}",
+                        'verse_start': start_verse,
+                        'verse_end': end_verse,
                         'original_text': match.group(0),
                         'start_pos': match.start(),
                         'end_pos': match.end(),
@@ -148,46 +269,99 @@ class PerfectVerseParser:
         
         # Pattern 3: Chapter:verse only (when book is in context)
         # Examples: "12:14-22" when we know we're in 1 Corinthians
-        chapter_verse_pattern = r'(?<![A-Za-z])(\d+):(\d+)(?:-(\d+))?(?![A-Za-z])'
-        
-        for match in re.finditer(chapter_verse_pattern, line):
+        # Matches come in order, so the spans found so far are swept by
+        # start, keeping the furthest end of those starting at or before
+        # the match
+        spans = sorted((ref['start_pos'], ref['end_pos']) for ref in references)
+        span_index = 0
+        covered_end = -1
+        for match in _CV_RE.finditer(line) if has_colon else ():
             # Only use this if we don't already have a full reference covering this position
             pos = match.start()
-            covered = any(ref['start_pos'] <= pos <= ref['end_pos'] for ref in references)
+            while span_index < len(spans) and spans[span_index][0] <= pos:
+                covered_end = max(covered_end, spans[span_index][1])
+                span_index += 1
+            covered = covered_end >= pos
             
             if not covered and context_book:
                 chapter = int(match.group(1))
                 start_verse = int(match.group(2))
                 end_verse = int(match.group(3)) if match.group(3) else start_verse
                 
-                for verse_num in range(start_verse, end_verse + 1):
+                if end_verse >= start_verse:
                     references.append({
                         'book': context_book,
                         'chapter': chapter,
-                        'verse': verse_num,
-                        'reference': f"{self._get_book_abbreviation(context_book)} {chapter}:{verse_num}",
+                        'verse_start': start_verse,
+                        'verse_end': end_verse,
                         'original_text': match.group(0),
-                        'start_pos': match.start(),
+                        'start_pos': pos,
                         'end_pos': match.end(),
                         'context_resolved': True
                     })
+                    covered_end = max(covered_end, match.end())
         
         return references
     
-    def _deduplicate_references(self, references: List[Dict]) -> List[Dict]:
+    def verse_keys(self, references: List[Dict]) -> List[Tuple[str, int, int]]:
         """
-        Remove duplicate references while preserving order
+        Expand references into their (book, chapter, verse) keys, in order
         """
-        seen = set()
-        unique_refs = []
-        
-        for ref in references:
-            ref_key = (ref['book'], ref['chapter'], ref['verse'])
-            if ref_key not in seen:
-                seen.add(ref_key)
-                unique_refs.append(ref)
-        
-        return unique_refs
+        return [(ref['book'], ref['chapter'], verse)
+                for ref in references
+                for verse in range(ref['verse_start'], ref['verse_end'] + 1)]
+    
+    def verse_reference_strings(self, references: List[Dict]) -> List[str]:
+        """
+        Expand references into one "Abbrev chapter:verse" string per verse
+        """
+        return [f"{self._get_book_abbreviation(book)} {chapter}:{verse}"
+                for book, chapter, verse in self.verse_keys(references)]
+    
+    def _iter_full_references(self, line: str):
+        """
+        Yield (start, end, book_text, groups) for each full reference in a
+        line whose book word is a known book; groups are the six
+        chapter/verse groups of _TAIL
+        """
+        if self._book_automaton is None:
+            for match in self._full_re.finditer(line):
+                yield match.start(), match.end(), match.group(1), match.groups()[1:]
+            return
+        
+        # Same matches as the regex in __init__: a whole book word, optionally
+        # preceded by "1"/"2"/"3" and "cf.", then the chapter and verses
+        lowered = line.translate(_ASCII_LOWER)
+        last_end = 0
+        for word_end, length in sorted(self._book_automaton.iter(lowered), key=lambda hit: hit[0] - hit[1]):
+            word_start = word_end - length + 1
+            if word_start < last_end or (word_start and lowered[word_start - 1].isascii()
+                                         and lowered[word_start - 1].isalpha()):
+                continue
+            tail = _TAIL_RE.match(line, word_end + 1)
+            if not tail:
+                continue
+            
+            book_start = self._skip_space_back(line, word_start, last_end)
+            if book_start > last_end and line[book_start - 1] in '123':
+                book_start -= 1
+            else:
+                book_start = word_start
+            
+            start = book_start
+            cf_end = self._skip_space_back(line, book_start, last_end)
+            if cf_end < book_start and cf_end - 3 >= last_end and lowered.startswith('cf.', cf_end - 3):
+                start = cf_end - 3
+            
+            yield start, tail.end(), line[book_start:word_end + 1], tail.groups()
+            last_end = tail.end()
+    
+    @staticmethod
+    def _skip_space_back(line: str, pos: int, stop: int) -> int:
+        """Move pos back over whitespace, but not before stop"""
+        while pos > stop and line[pos - 1].isspace():
+            pos -= 1
+        return pos
     
     def _normalize_book_name(self, book_text: str) -> str:
         """
@@ -209,13 +383,13 @@ class PerfectVerseParser:
             return self.book_abbreviations[book_clean]
         
         # Try case-insensitive lookup
-        for abbrev, full_name in self.book_abbreviations.items():
-            if abbrev.lower() == book_clean.lower():
-                return full_name
-            if full_name.lower() == book_clean.lower():
-                return full_name
+        book_lower = book_clean.lower()
+        full_name = self._abbrev_lower.get(book_lower) or self._fullname_lower.get(book_lower)
+        if full_name:
+            return full_name
         
-        return book_clean
+        # Unknown names repeat across references, so share one copy
+        return sys.intern(book_clean)
     
     def get_verse_text(self, book: str, chapter: int, verse: int) -> str:
         """
@@ -237,44 +411,33 @@ class PerfectVerseParser:
         if not references:
             return text
         
-        # Build the output with verses inserted at the beginning
-        output_lines = []
-        
-        # Collect all unique verses
+        # Collect all unique verses (references are already deduplicated),
+        # fetching their text from the database in bulk
+        keys = self.verse_keys(references)
+        verse_data = self.db.lookup_verses_bulk(keys)
         unique_verses = []
-        seen_refs = set()
         
-        for ref in references:
-            verse_key = f"{ref['book']} {ref['chapter']}:{ref['verse']}"
-            if verse_key not in seen_refs:
-                verse_text = self.get_verse_text(ref['book'], ref['chapter'], ref['verse'])
-                if verse_text:
-                    book_abbrev = self._get_book_abbreviation(ref['book'])
-                    verse_ref = f"{book_abbrev} {ref['chapter']}:{ref['verse']}"
-                    unique_verses.append({
-                        'reference': verse_ref,
-                        'text': verse_text,
-                        'sort_key': (ref['book'], ref['chapter'], ref['verse'])
-                    })
-                    seen_refs.add(verse_key)
+        for book, chapter, verse_num in keys:
+            verse = verse_data.get((book, chapter, verse_num))
+            verse_text = verse.get('text') if verse else None
+            if verse_text:
+                book_abbrev = self._get_book_abbreviation(book)
+                verse_ref = f"{book_abbrev} {chapter}:{verse_num}"
+                unique_verses.append({
+                    'reference': verse_ref,
+                    'text': verse_text,
+                    'sort_key': (self._book_order.get(verse['book_name'], len(CANONICAL_BOOK_ORDER)),
+                                 chapter, verse_num)
+                })
         
-        # Sort verses by biblical order (book, chapter, verse)
+        # Sort verses by biblical order (book, chapter, verse); the book
+        # is the one the database resolved, so abbreviations sort too
         unique_verses.sort(key=lambda x: x['sort_key'])
         
-        # Add verses at the beginning
-        for verse in unique_verses:
-            output_lines.append(verse['reference'])
-            output_lines.append(verse['text'])
-            output_lines.append("")  # Empty line after each verse
-        
-        # Add the original outline content
-        output_lines.append("")  # Extra space before outline
-        
-        # Split original text into lines and add
-        for line in text.split('\n'):
-            output_lines.append(line)
-        
-        return '\n'.join(output_lines)
+        # Verses go at the beginning, each followed by an empty line, then
+        # an extra empty line and the original outline content unchanged
+        verse_block = ''.join(f"{verse['reference']}\n{verse['text']}\n\n" for verse in unique_verses)
+        return f"{verse_block}\n{text}"
     
     def _get_book_abbreviation(self, book_name: str) -> str:
         """
@@ -283,33 +446,54 @@ class PerfectVerseParser:
         if book_name in self.book_names_to_abbrev:
             return self.book_names_to_abbrev[book_name]
         
-        # Try to find a match
-        for abbrev, full_name in self.book_abbreviations.items():
-            if full_name.lower() == book_name.lower():
-                return abbrev
+        # Try a differently cased full name, giving the same abbreviation
+        full_name = self._fullname_lower.get(book_name.lower())
+        if full_name:
+            return self.book_names_to_abbrev[full_name]
         
         return book_name  # Return as-is if not found
     
+    def detect_and_stats(self, text: str) -> Tuple[List[Dict], Dict]:
+        """
+        Detect verse references and compute their statistics in one pass
+        """
+        references = self.detect_verse_references_with_context(text)
+        return references, self._stats_from_references(references)
+    
     def get_detection_stats(self, text: str) -> Dict:
         """
         Get statistics about verse detection for debugging
         """
         references = self.detect_verse_references_with_context(text)
-        
+        return self._stats_from_references(references)
+    
+    def _stats_from_references(self, references: List[Dict]) -> Dict:
+        """
+        Compute detection statistics from already detected references
+        """
+        # Each reference counts once per verse of its range
         stats = {
-            'total_references': len(references),
-            'unique_verses': len(set((ref['book'], ref['chapter'], ref['verse']) for ref in references)),
-            'context_resolved': len([ref for ref in references if ref.get('context_resolved')]),
-            'books_detected': len(set(ref['book'] for ref in references)),
+            'total_references': 0,
+            'unique_verses': 0,
+            'context_resolved': 0,
+            'books_detected': 0,
             'references_by_book': {}
         }
         
-        # Count references by book
         for ref in references:
             book = ref['book']
+            verse_count = ref['verse_end'] - ref['verse_start'] + 1
+            stats['total_references'] += verse_count
+            if ref.get('context_resolved'):
+                stats['context_resolved'] += verse_count
+            
+            # Count references by book
             if book not in stats['references_by_book']:
                 stats['references_by_book'][book] = 0
-            stats['references_by_book'][book] += 1
+            stats['references_by_book'][book] += verse_count
+        
+        stats['unique_verses'] = len(set(self.verse_keys(references)))
+        stats['books_detected'] = len(stats['references_by_book'])
         
         return stats
 
@@ -1,24 +1,61 @@
 """
 PostgreSQL Session Manager for persistent session storage on Render
-Uses PostgreSQL database for production-ready session persistence
+Uses PostgreSQL database for production-ready session persistence, through
+a psycopg 3 connection pool when installed, otherwise psycopg2
 """
 
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 import logging
 
+# orjson encodes and parses session JSON several times faster than json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    from psycopg_pool import ConnectionPool
+    PSYCOPG_POOL_AVAILABLE = True
+except ImportError:
+    PSYCOPG_POOL_AVAILABLE = False
+
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
     PSYCOPG2_AVAILABLE = True
 except ImportError:
     PSYCOPG2_AVAILABLE = False
-    print("psycopg2 not available - PostgreSQL session manager disabled")
+    if not PSYCOPG_POOL_AVAILABLE:
+        print("psycopg2 not available - PostgreSQL session manager disabled")
 
 logger = logging.getLogger(__name__)
 
+# Connections kept by the psycopg pool, sized for the app's worker threads
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 10
+
+# Executions of the same statement on a connection before psycopg
+# prepares it on the server
+PREPARE_THRESHOLD = 5
+
+
+def _dumps(value: Any) -> str:
+    """Serialize a value to JSON text"""
+    if ORJSON_AVAILABLE:
+        # Non-string keys become strings, as they do with json
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(value)
+
+
+def _loads(text: str) -> Any:
+    """Parse JSON text"""
+    return orjson.loads(text) if ORJSON_AVAILABLE else json.loads(text)
+
+
 class PostgresSessionManager:
     def __init__(self, connection_string: str = None):
         """
@@ -27,8 +64,8 @@ class PostgresSessionManager:
         Args:
             connection_string: PostgreSQL connection string (uses DATABASE_URL env var if not provided)
         """
-        if not PSYCOPG2_AVAILABLE:
-            raise ImportError("psycopg2 is not available - cannot use PostgreSQL session manager")
+        if not PSYCOPG_POOL_AVAILABLE and not PSYCOPG2_AVAILABLE:
+            raise ImportError("Neither psycopg nor psycopg2 is available - cannot use PostgreSQL session manager")
             
         if connection_string is None:
             # Get from environment variable (Render provides this)
@@ -41,6 +78,16 @@ class PostgresSessionManager:
         
         self.connection_string = connection_string
         
+        self._pool = None
+        if self.connection_string and PSYCOPG_POOL_AVAILABLE:
+            self._pool = ConnectionPool(
+                self.connection_string,
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                kwargs={'prepare_threshold': PREPARE_THRESHOLD},
+                open=True
+            )
+        
         # Only initialize if we have a connection string
         if self.connection_string:
             self._init_database()
@@ -52,39 +99,67 @@ class PostgresSessionManager:
         if not self.connection_string:
             return None
         return psycopg2.connect(self.connection_string)
+    
+    @contextmanager
+    def _transaction(self):
+        """
+        Get a connection for one transaction, committed if the block
+        succeeds and rolled back if it raises; the connection is always
+        returned to the pool, or closed without one
+        """
+        if self._pool is not None:
+            with self._pool.connection() as conn:
+                yield conn
+            return
+        
+        conn = self._get_connection()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
         
     def _init_database(self):
         """Initialize the session table in PostgreSQL"""
         try:
-            conn = self._get_connection()
-            if not conn:
-                return
+            with self._transaction() as conn, conn.cursor() as cursor:
+                # Create sessions table if it doesn't exist
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS sessions (
+                        session_id VARCHAR(255) PRIMARY KEY,
+                        data JSONB NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # Create index for faster queries
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_sessions_updated 
+                    ON sessions(updated_at)
+                ''')
                 
-            cursor = conn.cursor()
-            
-            # Create sessions table if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sessions (
-                    session_id VARCHAR(255) PRIMARY KEY,
-                    data JSONB NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create index for faster queries
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_sessions_updated 
-                ON sessions(updated_at)
-            ''')
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
             logger.info("PostgreSQL session table initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize PostgreSQL session table: {e}")
+            return
+        
+        try:
+            # Large session values are compressed in TOAST storage; lz4 does
+            # that several times faster than the default pglz. The catalog
+            # column and SET COMPRESSION need PostgreSQL 14 or later
+            with self._transaction() as conn, conn.cursor() as cursor:
+                cursor.execute('''
+                    SELECT attcompression FROM pg_attribute
+                    WHERE attrelid = 'sessions'::regclass AND attname = 'data'
+                ''')
+                result = cursor.fetchone()
+                if result and result[0] != 'l':
+                    cursor.execute("ALTER TABLE sessions ALTER COLUMN data SET COMPRESSION lz4")
+                    
+        except Exception as e:
+            logger.info(f"Session data compression left at the server default: {e}")
             
     def save_session(self, session_id: str, data: Dict[str, Any]):
         """
@@ -94,34 +169,26 @@ class PostgresSessionManager:
             session_id: Unique session identifier
             data: Session data to store
         """
-        conn = self._get_connection()
-        if not conn:
+        if not self.connection_string:
             logger.warning("No database connection, session not saved")
             return
             
         try:
-            cursor = conn.cursor()
-            
-            # Use JSONB for efficient storage and querying
-            cursor.execute('''
-                INSERT INTO sessions (session_id, data, updated_at)
-                VALUES (%s, %s, CURRENT_TIMESTAMP)
-                ON CONFLICT (session_id) 
-                DO UPDATE SET 
-                    data = EXCLUDED.data,
-                    updated_at = CURRENT_TIMESTAMP
-            ''', (session_id, json.dumps(data)))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with self._transaction() as conn, conn.cursor() as cursor:
+                # Use JSONB for efficient storage and querying
+                cursor.execute('''
+                    INSERT INTO sessions (session_id, data, updated_at)
+                    VALUES (%s, %s::jsonb, CURRENT_TIMESTAMP)
+                    ON CONFLICT (session_id) 
+                    DO UPDATE SET 
+                        data = EXCLUDED.data,
+                        updated_at = CURRENT_TIMESTAMP
+                ''', (session_id, _dumps(data)))
+                
             logger.debug(f"Session {session_id} saved successfully")
             
         except Exception as e:
             logger.error(f"Failed to save session {session_id}: {e}")
-            if conn:
-                conn.rollback()
-                conn.close()
                 
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -133,30 +200,26 @@ class PostgresSessionManager:
         Returns:
             Session data or None if not found
         """
-        conn = self._get_connection()
-        if not conn:
+        if not self.connection_string:
             logger.warning("No database connection, returning None")
             return None
             
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            cursor.execute('''
-                SELECT data FROM sessions WHERE session_id = %s
-            ''', (session_id,))
-            
-            result = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
+            with self._transaction() as conn, conn.cursor() as cursor:
+                # Fetched as text so it is parsed here rather than by the
+                # driver's stdlib json
+                cursor.execute('''
+                    SELECT data::text FROM sessions WHERE session_id = %s
+                ''', (session_id,))
+                
+                result = cursor.fetchone()
+                
             if result:
-                return result['data']
+                return _loads(result[0])
             return None
             
         except Exception as e:
             logger.error(f"Failed to get session {session_id}: {e}")
-            if conn:
-                conn.close()
             return None
             
     def delete_session(self, session_id: str):
@@ -166,27 +229,19 @@ class PostgresSessionManager:
         Args:
             session_id: Session identifier
         """
-        conn = self._get_connection()
-        if not conn:
+        if not self.connection_string:
             return
             
         try:
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                DELETE FROM sessions WHERE session_id = %s
-            ''', (session_id,))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with self._transaction() as conn, conn.cursor() as cursor:
+                cursor.execute('''
+                    DELETE FROM sessions WHERE session_id = %s
+                ''', (session_id,))
+                
             logger.debug(f"Session {session_id} deleted")
             
         except Exception as e:
             logger.error(f"Failed to delete session {session_id}: {e}")
-            if conn:
-                conn.rollback()
-                conn.close()
                 
     def cleanup_old_sessions(self, hours: int = 24):
         """
@@ -198,31 +253,23 @@ class PostgresSessionManager:
         Returns:
             Number of sessions deleted
         """
-        conn = self._get_connection()
-        if not conn:
+        if not self.connection_string:
             return 0
             
         try:
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                DELETE FROM sessions 
-                WHERE updated_at < NOW() - INTERVAL '%s hours'
-            ''', (hours,))
-            
-            deleted = cursor.rowcount
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
+            with self._transaction() as conn, conn.cursor() as cursor:
+                cursor.execute('''
+                    DELETE FROM sessions 
+                    WHERE updated_at < NOW() - %s * INTERVAL '1 hour'
+                ''', (hours,))
+                
+                deleted = cursor.rowcount
+                
             logger.info(f"Cleaned up {deleted} old sessions")
             return deleted
             
         except Exception as e:
             logger.error(f"Failed to cleanup old sessions: {e}")
-            if conn:
-                conn.rollback()
-                conn.close()
             return 0
             
     def session_exists(self, session_id: str) -> bool:
@@ -235,25 +282,25 @@ class PostgresSessionManager:
         Returns:
             True if session exists, False otherwise
         """
-        conn = self._get_connection()
-        if not conn:
+        if not self.connection_string:
             return False
             
         try:
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT 1 FROM sessions WHERE session_id = %s LIMIT 1
-            ''', (session_id,))
-            
-            result = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
+            with self._transaction() as conn, conn.cursor() as cursor:
+                cursor.execute('''
+                    SELECT 1 FROM sessions WHERE session_id = %s LIMIT 1
+                ''', (session_id,))
+                
+                result = cursor.fetchone()
+                
             return result is not None
             
         except Exception as e:
             logger.error(f"Failed to check session existence {session_id}: {e}")
-            if conn:
-                conn.close()
-            return False
\ No newline at end of file
+            return False
+            
+    def close(self):
+        """Close the connection pool, if any"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
\ No newline at end of file
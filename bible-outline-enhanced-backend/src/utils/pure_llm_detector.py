@@ -4,155 +4,98 @@ Pure LLM-based Verse Detector - No regex, only intelligent LLM detection
 Based on comprehensive analysis of 12 outline PDFs with 3,311 verse references
 """
 
+import asyncio
+import hashlib
 import json
 import os
+import random
+import re
+import time
 from typing import List, Dict, Optional, Any
-from dataclasses import dataclass
-from openai import OpenAI
+from dataclasses import asdict, dataclass
+from openai import (AsyncOpenAI, OpenAI, APIConnectionError, APITimeoutError,
+                    InternalServerError, RateLimitError)
 
-@dataclass
-class VerseReference:
-    """Represents a Bible verse reference"""
-    book: str
-    chapter: int
-    start_verse: int
-    end_verse: Optional[int]
-    original_text: str
-    confidence: float = 1.0
-    pattern: str = "llm"
-    context: str = ""
+# orjson parses the multi-KB JSON responses faster; json is used without it
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
-class PureLLMDetector:
-    """Pure LLM-based detector without any regex patterns"""
-    
-    def __init__(self, openai_key: str = None):
-        self.openai_key = openai_key or os.getenv('OPENAI_API_KEY')
-        if not self.openai_key:
-            raise ValueError("OpenAI API key required for LLM detector")
-        
-        self.client = OpenAI(api_key=self.openai_key)
-    
-    def detect_verses(self, text: str) -> Dict:
-        """Detect verses and document structure using pure LLM intelligence"""
-        
-        # Process in chunks for large documents
-        if len(text) > 15000:  # Increased threshold since GPT-5 can handle more
-            return self._detect_verses_chunked(text)
-        
-        prompt = self._build_comprehensive_prompt(text)
-        
-        try:
-            # Use GPT-5 for maximum accuracy (REQUIRED - per CLAUDE.md)
-            response = self.client.chat.completions.create(
-                model="gpt-5",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are an expert Bible verse reference extractor. Return ONLY valid JSON."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                temperature=1,  # GPT-5 only supports default temperature
-                max_completion_tokens=8000,  # Increased for comprehensive detection
-                timeout=90  # 90 second timeout
-            )
-            
-            content = response.choices[0].message.content
-            result = self._parse_llm_response_full(content)
-            
-            if 'verses' in result:
-                print(f"Pure LLM detected {len(result['verses'])} verses")
-            return result
-            
-        except Exception as e:
-            print(f"GPT-5 detection error (falling back to GPT-4o per CLAUDE.md): {e}")
-            # Fallback to GPT-4o as specified in CLAUDE.md (NOT GPT-3.5 or GPT-4o-mini)
-            try:
-                response = self.client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "You are an expert Bible verse reference extractor. Return ONLY valid JSON."
-                        },
-                        {
-                            "role": "user", 
-                            "content": prompt  # Use full prompt for better accuracy
-                        }
-                    ],
-                    temperature=0.1,
-                    max_tokens=4000,
-                    timeout=60
-                )
-                content = response.choices[0].message.content
-                result = self._parse_llm_response_full(content)
-                if 'verses' in result:
-                    print(f"GPT-4o fallback detected {len(result['verses'])} verses")
-                return result
-            except Exception as e2:
-                print(f"GPT-4o fallback also failed: {e2}")
-                # Return empty structure per CLAUDE.md requirements
-                return {
-                    'metadata': {},
-                    'outline_structure': [],
-                    'verses': []
-                }
-    
-    def _detect_verses_chunked(self, text: str) -> Dict:
-        """Process large text in overlapping chunks"""
-        result = {
-            'metadata': {},
-            'outline_structure': [],
-            'verses': []
-        }
-        all_verses = []
-        seen_refs = set()
-        
-        # First chunk should capture metadata
-        first_chunk = text[:8000]
-        first_result = self.detect_verses(first_chunk)
-        
-        # Get metadata and structure from first chunk
-        if isinstance(first_result, dict):
-            result['metadata'] = first_result.get('metadata', {})
-            result['outline_structure'] = first_result.get('outline_structure', [])
-            if 'verses' in first_result:
-                for v in first_result['verses']:
-                    ref_key = f"{v.book}_{v.chapter}_{v.start_verse}_{v.end_verse}"
-                    if ref_key not in seen_refs:
-                        seen_refs.add(ref_key)
-                        all_verses.append(v)
-        
-        # Process remaining chunks for additional verses
-        chunk_size = 7000
-        overlap = 1000
-        
-        for i in range(7000, len(text), chunk_size - overlap):
-            chunk = text[i:i + chunk_size]
-            
-            # Add context from previous chunk for continuity
-            if i > 0:
-                chunk = text[max(0, i-200):i] + "\n[...]\n" + chunk
-            
-            chunk_result = self.detect_verses(chunk)
-            
-            # Add unique verses
-            if isinstance(chunk_result, dict) and 'verses' in chunk_result:
-                for v in chunk_result['verses']:
-                    ref_key = f"{v.book}_{v.chapter}_{v.start_verse}_{v.end_verse}"
-                    if ref_key not in seen_refs:
-                        seen_refs.add(ref_key)
-                        all_verses.append(v)
-        
-        result['verses'] = all_verses
-        return result
-    
-    def _build_comprehensive_prompt(self, text: str) -> str:
-        """Build comprehensive prompt based on analysis of 3,311 verse references"""
-        return f"""You are analyzing a theological outline document. Extract ALL information and verses.
+# Chunk requests in flight at once, to stay within OpenAI rate limits
+MAX_CONCURRENT_REQUESTS = 8
+
+# Attempts at one model's request before falling back to the next model,
+# and the bounds in seconds of the randomized exponential wait between them
+OPENAI_MAX_ATTEMPTS = 3
+OPENAI_BACKOFF_MIN = 1
+OPENAI_BACKOFF_MAX = 30
+
+# Errors worth retrying on the same model: rate limits, timeouts, dropped
+# connections and server-side failures
+OPENAI_RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# Models whose cached results are reused, most preferred first
+CACHED_MODELS = ('gpt-5', 'gpt-4o')
+
+# Seconds between status checks of a Batch API job
+BATCH_POLL_INTERVAL = 30
+
+# Batch API job states after which the job will not change
+BATCH_FINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+# Characters of a document sent to the LLM for analysis in one request
+PROMPT_TEXT_CHARS = 3500
+
+# Most characters in one chunk of a large document, so the whole chunk is
+# analyzed, and in the closing paragraph carried over into the next chunk
+CHUNK_MAX_CHARS = PROMPT_TEXT_CHARS
+CHUNK_OVERLAP_CHARS = 800
+
+# Longest verse range expanded into single verses; the longest chapter has
+# 176 verses, so longer ranges are kept as returned
+MAX_RANGE_VERSES = 176
+
+# A fenced code block in an LLM response, with or without a json language tag
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.S)
+
+# A trailing comma before a closing brace or bracket, which LLMs often emit
+_TRAIL_COMMA_RE = re.compile(r",\s*([}\]])")
+
+# Common abbreviations to full names, used by _normalize_book_name
+_BOOK_MAP = {
+    'Rom': 'Romans', 'Matt': 'Matthew', 'Mk': 'Mark', 'Lk': 'Luke',
+    'Jn': 'John', '1 Cor': '1 Corinthians', '2 Cor': '2 Corinthians',
+    'Gal': 'Galatians', 'Eph': 'Ephesians', 'Phil': 'Philippians',
+    'Col': 'Colossians', '1 Thess': '1 Thessalonians', '2 Thess': '2 Thessalonians',
+    '1 Tim': '1 Timothy', '2 Tim': '2 Timothy', 'Tit': 'Titus',
+    'Philem': 'Philemon', 'Heb': 'Hebrews', 'Jas': 'James',
+    '1 Pet': '1 Peter', '2 Pet': '2 Peter', '1 Jn': '1 John',
+    '2 Jn': '2 John', '3 Jn': '3 John', 'Rev': 'Revelation',
+    'Gen': 'Genesis', 'Ex': 'Exodus', 'Lev': 'Leviticus', 'Num': 'Numbers',
+    'Deut': 'Deuteronomy', 'Josh': 'Joshua', 'Judg': 'Judges',
+    '1 Sam': '1 Samuel', '2 Sam': '2 Samuel', 'Ps': 'Psalms', 'Psalm': 'Psalms',
+    'Prov': 'Proverbs', 'Eccl': 'Ecclesiastes', 'Song': 'Song of Solomon',
+    'Isa': 'Isaiah', 'Jer': 'Jeremiah', 'Lam': 'Lamentations',
+    'Ezek': 'Ezekiel', 'Dan': 'Daniel', 'Hos': 'Hosea', 'Obad': 'Obadiah',
+    'Mic': 'Micah', 'Nah': 'Nahum', 'Hab': 'Habakkuk', 'Zeph': 'Zephaniah',
+    'Hag': 'Haggai', 'Zech': 'Zechariah', 'Mal': 'Malachi'
+}
+
+# Book names and abbreviations, also without spaces in any case, to full names
+_CANON = (
+    _BOOK_MAP
+    | {abbr.replace(' ', '').lower(): full for abbr, full in _BOOK_MAP.items()}
+    | {full: full for full in _BOOK_MAP.values()}
+)
+
+# Instructions sent as the system message of every detection request. It
+# never varies, so OpenAI caches it as a shared prompt prefix; keep it free
+# of per-request content
+_SYSTEM_RUBRIC = """You are an expert Bible verse reference extractor. Return ONLY valid JSON.
+
+You are analyzing a theological outline document. Extract ALL information and verses.
 
 STEP 1 - EXTRACT DOCUMENT METADATA (FIRST 3-4 LINES):
 Look at the very first lines of the document:
@@ -161,8 +104,7 @@ Look at the very first lines of the document:
 - Line 3: Subtitle if present (e.g., "and as the One Who Makes Us More Than Conquerors")
 - Line 4 or 5: Scripture Reading (e.g., "Scripture Reading: Rom. 8:2, 31-39")
 
-The document starts with:
-{text[:500]}
+The document's opening lines follow the "The document starts with:" heading.
 
 STEP 2 - EXTRACT OUTLINE STRUCTURE:
 Find the hierarchical outline with:
@@ -174,9 +116,9 @@ Find the hierarchical outline with:
 VERSE FORMATS TO DETECT (all 1,797 variations found):
 
 1. SCRIPTURE READING PATTERNS:
-   - "Scripture Reading: Rom. 8:2, 31-39" → Expand to ALL verses
+   - "Scripture Reading: Rom. 8:2, 31-39" → Capture ALL verses and ranges
    - "Scripture Reading: Eph. 4:7-16; 6:10-20" → Multiple books/chapters
-   - Ranges MUST be expanded: "31-39" = verses 31, 32, 33, 34, 35, 36, 37, 38, 39
+   - Ranges are ONE entry: "31-39" = start_verse 31, end_verse 39
 
 2. STANDARD REFERENCES (422 formats):
    - "John 3:16" - simple format
@@ -217,64 +159,473 @@ VERSE FORMATS TO DETECT (all 1,797 variations found):
    - Embedded in sentences: "according to Romans 8:28-30"
    - Written forms: "First Corinthians" = "1 Corinthians"
 
-CRITICAL EXPANSION RULES:
-- ALWAYS expand ranges: "Rom. 8:31-39" → create INDIVIDUAL entries for verses 31, 32, 33, 34, 35, 36, 37, 38, 39
+CRITICAL RANGE RULES:
+- Return ranges compactly, do NOT enumerate them: "Rom. 8:31-39" → ONE entry with start_verse 31 and end_verse 39
 - For "Scripture Reading: Rom. 8:2, 31-39" you MUST create:
-  * One entry for Rom. 8:2
-  * Nine separate entries for Rom. 8:31 through Rom. 8:39
+  * One entry for Rom. 8:2 (end_verse null)
+  * One entry for Rom. 8:31-39 (start_verse 31, end_verse 39)
 - ALWAYS resolve context: "v. 2" needs book/chapter from Scripture Reading
 - ALWAYS split semicolons: "Eph. 4:7-16; 6:10-20" → two separate ranges
 - ALWAYS normalize books: "Rom" → "Romans", "1 Cor" → "1 Corinthians"
 
 EXAMPLE for "Scripture Reading: Rom. 8:2, 31-39":
-You must return 10 verse entries total:
+You must return 2 verse entries total:
 1. Rom. 8:2
-2. Rom. 8:31
-3. Rom. 8:32
-4. Rom. 8:33
-5. Rom. 8:34
-6. Rom. 8:35
-7. Rom. 8:36
-8. Rom. 8:37
-9. Rom. 8:38
-10. Rom. 8:39
+2. Rom. 8:31-39
 
 OUTPUT FORMAT - Return JSON with metadata AND verses:
-{{
-  "metadata": {{
+{
+  "metadata": {
     "message_number": "Message Two",
     "title": "Christ as the Emancipator",  
     "subtitle": "and as the One Who Makes Us More Than Conquerors",
     "hymns": ""
-  }},
+  },
   "outline_structure": [
-    {{"type": "scripture_reading", "text": "Rom. 8:2, 31-39"}},
-    {{"type": "outline", "number": "I", "text": "We can experience, enjoy, and express Christ as our Emancipator by the law of the Spirit of life"}},
-    {{"type": "outline", "number": "A", "text": "The enjoyment of the law of the Spirit of life..."}}
+    {"type": "scripture_reading", "text": "Rom. 8:2, 31-39"},
+    {"type": "outline", "number": "I", "text": "We can experience, enjoy, and express Christ as our Emancipator by the law of the Spirit of life"},
+    {"type": "outline", "number": "A", "text": "The enjoyment of the law of the Spirit of life..."}
   ],
   "verses": [
-    {{"reference": "Rom. 8:2", "book": "Romans", "chapter": 8, "start_verse": 2, "end_verse": null, "context": "Scripture Reading"}},
-    {{"reference": "Rom. 8:31", "book": "Romans", "chapter": 8, "start_verse": 31, "end_verse": null, "context": "Scripture Reading"}},
-    {{"reference": "Rom. 8:32", "book": "Romans", "chapter": 8, "start_verse": 32, "end_verse": null, "context": "Scripture Reading"}},
-    {{"reference": "Rom. 8:33", "book": "Romans", "chapter": 8, "start_verse": 33, "end_verse": null, "context": "Scripture Reading"}},
-    {{"reference": "Rom. 8:34", "book": "Romans", "chapter": 8, "start_verse": 34, "end_verse": null, "context": "Scripture Reading"}},
-    {{"reference": "Rom. 8:35", "book": "Romans", "chapter": 8, "start_verse": 35, "end_verse": null, "context": "Scripture Reading"}},
-    {{"reference": "Rom. 8:36", "book": "Romans", "chapter": 8, "start_verse": 36, "end_verse": null, "context": "Scripture Reading"}},
-    {{"reference": "Rom. 8:37", "book": "Romans", "chapter": 8, "start_verse": 37, "end_verse": null, "context": "Scripture Reading"}},
-    {{"reference": "Rom. 8:38", "book": "Romans", "chapter": 8, "start_verse": 38, "end_verse": null, "context": "Scripture Reading"}},
-    {{"reference": "Rom. 8:39", "book": "Romans", "chapter": 8, "start_verse": 39, "end_verse": null, "context": "Scripture Reading"}},
+    {"reference": "Rom. 8:2", "book": "Romans", "chapter": 8, "start_verse": 2, "end_verse": null, "context": "Scripture Reading"},
+    {"reference": "Rom. 8:31-39", "book": "Romans", "chapter": 8, "start_verse": 31, "end_verse": 39, "context": "Scripture Reading"},
     ... (continue with ALL other verses found in the document)
   ]
-}}
+}
 
 IMPORTANT: 
 - Extract EVERY verse reference, no matter how it appears
-- Expand ALL ranges into individual verses
+- Give each range as one entry with start_verse and end_verse, never verse by verse
 - Use context to resolve incomplete references
 - Return ONLY the JSON array, no explanations
+- The text to analyze follows the "Text to analyze:" heading
+"""
+
+def _json_loads(json_str: str) -> Any:
+    """Parse JSON with orjson when installed"""
+    return orjson.loads(json_str) if ORJSON_AVAILABLE else json.loads(json_str)
+
+
+def _extract_json(content: str, brackets: str = '{}') -> Optional[Any]:
+    """
+    Parse the JSON value in an LLM response, taken from a fenced code block or
+    else the outermost brackets; None if there is none. Trailing commas are
+    removed when the value does not parse as given
+    """
+    match = _FENCE_RE.search(content)
+    if match:
+        json_str = match.group(1).strip()
+    else:
+        start_idx = content.find(brackets[0])
+        end_idx = content.rfind(brackets[1]) + 1
+        json_str = content[start_idx:end_idx] if start_idx >= 0 and end_idx > start_idx else ""
+    
+    if not json_str:
+        return None
+    try:
+        return _json_loads(json_str)
+    except ValueError:
+        return _json_loads(_TRAIL_COMMA_RE.sub(r"\1", json_str))
+
+
+def _split_oversized(paragraph: str) -> List[str]:
+    """
+    Split a paragraph longer than CHUNK_MAX_CHARS into pieces of whole lines,
+    cutting single lines that are still too long
+    """
+    if len(paragraph) <= CHUNK_MAX_CHARS:
+        return [paragraph]
+    
+    lines = []
+    for line in paragraph.split('\n'):
+        lines.extend(line[i:i + CHUNK_MAX_CHARS] for i in range(0, max(len(line), 1), CHUNK_MAX_CHARS))
+    
+    pieces = []
+    current = lines[0]
+    for line in lines[1:]:
+        if len(current) + 1 + len(line) > CHUNK_MAX_CHARS:
+            pieces.append(current)
+            current = line
+        else:
+            current += '\n' + line
+    pieces.append(current)
+    return pieces
+
+
+@dataclass(slots=True, frozen=True)
+class VerseReference:
+    """Represents a Bible verse reference; immutable, and without a per-instance __dict__"""
+    book: str
+    chapter: int
+    start_verse: int
+    end_verse: Optional[int]
+    original_text: str
+    confidence: float = 1.0
+    pattern: str = "llm"
+    context: str = ""
+
+class PureLLMDetector:
+    """Pure LLM-based detector without any regex patterns"""
+    
+    def __init__(self, openai_key: str = None, race_fallback: bool = None, result_cache=None):
+        """
+        Args:
+            openai_key: OpenAI API key (defaults to OPENAI_API_KEY)
+            race_fallback: Request GPT-5 and GPT-4o at once and use the first
+                answer, instead of GPT-4o only after GPT-5 fails; up to twice
+                the spend (defaults to off unless RACE_MODEL_FALLBACK=true)
+            result_cache: Store of parsed results by request hash, such as
+                SessionManager, so repeated text skips the LLM
+        """
+        self.openai_key = openai_key or os.getenv('OPENAI_API_KEY')
+        if not self.openai_key:
+            raise ValueError("OpenAI API key required for LLM detector")
+        
+        if race_fallback is None:
+            race_fallback = os.getenv('RACE_MODEL_FALLBACK', 'false').lower() == 'true'
+        self.race_fallback = race_fallback
+        self.result_cache = result_cache
+        
+        self.client = OpenAI(api_key=self.openai_key)
+    
+    def detect_verses(self, text: str) -> Dict:
+        """Detect verses and document structure using pure LLM intelligence"""
+        return asyncio.run(self._adetect_verses(text))
+    
+    async def _adetect_verses(self, text: str) -> Dict:
+        """Run detection with an async client that lives for this event loop"""
+        # Retries are made by _call_openai, not the client
+        aclient = AsyncOpenAI(api_key=self.openai_key, max_retries=0)
+        try:
+            # Process in chunks for large documents
+            if len(text) > 15000:  # Increased threshold since GPT-5 can handle more
+                return await self._detect_verses_chunked(aclient, text)
+            return await self._adetect_one(aclient, text)
+        finally:
+            await aclient.close()
+    
+    async def _adetect_one(self, aclient: AsyncOpenAI, text: str) -> Dict:
+        """Detect verses in text with a single LLM request"""
+        messages = self._build_messages(text)
+        request_hash = self._hash_request(messages)
+        cached = self._get_cached_result(request_hash)
+        if cached is not None:
+            print(f"Pure LLM result served from cache, {len(cached['verses'])} verses")
+            return cached
+        
+        if self.race_fallback:
+            return await self._adetect_raced(aclient, messages, request_hash)
+        
+        try:
+            # Use GPT-5 for maximum accuracy (REQUIRED - per CLAUDE.md)
+            content = await self._request_gpt5(aclient, messages)
+            result = self._parse_llm_response_full(content)
+            self._save_cached_result(request_hash, 'gpt-5', result)
+            
+            if 'verses' in result:
+                print(f"Pure LLM detected {len(result['verses'])} verses")
+            return result
+            
+        except Exception as e:
+            print(f"GPT-5 detection error (falling back to GPT-4o per CLAUDE.md): {e}")
+            # Fallback to GPT-4o as specified in CLAUDE.md (NOT GPT-3.5 or GPT-4o-mini)
+            try:
+                content = await self._request_gpt4o(aclient, messages)
+                result = self._parse_llm_response_full(content)
+                self._save_cached_result(request_hash, 'gpt-4o', result)
+                if 'verses' in result:
+                    print(f"GPT-4o fallback detected {len(result['verses'])} verses")
+                return result
+            except Exception as e2:
+                print(f"GPT-4o fallback also failed: {e2}")
+                # Return empty structure per CLAUDE.md requirements
+                return {
+                    'metadata': {},
+                    'outline_structure': [],
+                    'verses': []
+                }
+    
+    async def _adetect_raced(self, aclient: AsyncOpenAI, messages: List[Dict], request_hash: str) -> Dict:
+        """
+        Request GPT-5 and GPT-4o at once and use the first successful answer,
+        preferring GPT-5 when both arrive together; the other is cancelled
+        """
+        primary = asyncio.create_task(self._request_gpt5(aclient, messages))
+        fallback = asyncio.create_task(self._request_gpt4o(aclient, messages))
+        models = {primary: 'gpt-5', fallback: 'gpt-4o'}
+        pending = {primary, fallback}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if task.exception() is not None:
+                        print(f"{models[task]} detection error in race: {task.exception()}")
+                        continue
+                    result = self._parse_llm_response_full(task.result())
+                    self._save_cached_result(request_hash, models[task], result)
+                    if 'verses' in result:
+                        print(f"{models[task]} won the race, detected {len(result['verses'])} verses")
+                    return result
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        # Return empty structure per CLAUDE.md requirements
+        return {
+            'metadata': {},
+            'outline_structure': [],
+            'verses': []
+        }
+    
+    def _hash_request(self, messages: List[Dict]) -> str:
+        """Hash the prompt of a detection request, which fully determines its result"""
+        return hashlib.sha256('\n'.join(m['content'] for m in messages).encode('utf-8')).hexdigest()
+    
+    def _get_cached_result(self, request_hash: str) -> Optional[Dict]:
+        """Get a cached detection result, or None without a cache or a hit"""
+        if self.result_cache is None:
+            return None
+        try:
+            cached = self.result_cache.get_llm_result(request_hash, CACHED_MODELS)
+        except Exception as e:
+            print(f"LLM result cache lookup failed: {e}")
+            return None
+        if cached is None:
+            return None
+        cached['verses'] = [VerseReference(**v) for v in cached['verses']]
+        return cached
+    
+    def _save_cached_result(self, request_hash: str, model: str, result: Dict):
+        """Cache a detection result; results without verses are not kept, so they are retried"""
+        if self.result_cache is None or not result.get('verses'):
+            return
+        try:
+            self.result_cache.save_llm_result(request_hash, model, {
+                'metadata': result['metadata'],
+                'outline_structure': result['outline_structure'],
+                'verses': [asdict(v) for v in result['verses']]
+            })
+        except Exception as e:
+            print(f"LLM result cache store failed: {e}")
+    
+    async def _request_gpt5(self, aclient: AsyncOpenAI, messages: List[Dict]) -> str:
+        """Request the primary GPT-5 completion"""
+        return await self._call_openai(
+            aclient,
+            model="gpt-5",
+            messages=messages,
+            temperature=1,  # GPT-5 only supports default temperature
+            max_completion_tokens=8000,  # Increased for comprehensive detection
+            timeout=90  # 90 second timeout
+        )
+    
+    async def _request_gpt4o(self, aclient: AsyncOpenAI, messages: List[Dict]) -> str:
+        """Request the GPT-4o fallback completion"""
+        return await self._call_openai(
+            aclient,
+            model="gpt-4o",
+            messages=messages,  # Use full prompt for better accuracy
+            temperature=0.1,
+            max_tokens=4000,
+            timeout=60
+        )
+    
+    async def _call_openai(self, aclient: AsyncOpenAI, **kwargs) -> str:
+        """
+        Request a chat completion and return its content, retrying transient
+        errors with randomized exponential backoff up to OPENAI_MAX_ATTEMPTS.
+        The completion is streamed, so it is read while it is generated
+        """
+        for attempt in range(OPENAI_MAX_ATTEMPTS):
+            try:
+                stream = await aclient.chat.completions.create(stream=True, **kwargs)
+                parts = []
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                return ''.join(parts)
+            except OPENAI_RETRYABLE_ERRORS as e:
+                if attempt == OPENAI_MAX_ATTEMPTS - 1:
+                    raise
+                delay = min(OPENAI_BACKOFF_MAX, random.uniform(OPENAI_BACKOFF_MIN, OPENAI_BACKOFF_MIN * 2 ** (attempt + 1)))
+                print(f"{kwargs['model']} request failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    async def _detect_verses_chunked(self, aclient: AsyncOpenAI, text: str) -> Dict:
+        """Process large text in overlapping chunks, requesting all chunks concurrently"""
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        
+        async def detect_chunk(chunk: str) -> Dict:
+            async with semaphore:
+                return await self._adetect_one(aclient, chunk)
+        
+        # Results come back in chunk order, as merging expects
+        chunk_results = await asyncio.gather(*(detect_chunk(chunk) for chunk in self._split_chunks(text)),
+                                             return_exceptions=True)
+        return self._merge_chunk_results(chunk_results)
+    
+    def _split_chunks(self, text: str) -> List[str]:
+        """
+        Split large text into chunks on paragraph boundaries, the first
+        capturing metadata; a short closing paragraph of each chunk is
+        repeated at the start of the next for continuity
+        """
+        if len(text) <= 15000:
+            return [text]
+        
+        pieces = []
+        for paragraph in text.split('\n\n'):
+            pieces.extend(_split_oversized(paragraph))
+        
+        chunks = []
+        current = []
+        current_len = 0
+        for piece in pieces:
+            # Paragraphs are rejoined with a blank line, two separator characters
+            if current and current_len + 2 + len(piece) > CHUNK_MAX_CHARS:
+                chunks.append('\n\n'.join(current))
+                last = current[-1]
+                # The carried paragraph gives way when the next one needs the room
+                if len(last) <= CHUNK_OVERLAP_CHARS and len(last) + 2 + len(piece) <= CHUNK_MAX_CHARS:
+                    current = [last]
+                    current_len = len(last)
+                else:
+                    current = []
+                    current_len = 0
+            current_len += len(piece) + (2 if current else 0)
+            current.append(piece)
+        
+        if current:
+            chunks.append('\n\n'.join(current))
+        
+        return chunks
+    
+    def _merge_chunk_results(self, chunk_results: List[Any]) -> Dict:
+        """Merge per-chunk results, skipping failed chunks and repeated verses"""
+        result = {
+            'metadata': {},
+            'outline_structure': [],
+            'verses': []
+        }
+        all_verses = []
+        seen_refs = set()
+        
+        # Get metadata and structure from first chunk
+        first_result = chunk_results[0]
+        if isinstance(first_result, dict):
+            result['metadata'] = first_result.get('metadata', {})
+            result['outline_structure'] = first_result.get('outline_structure', [])
+        
+        # Add unique verses
+        for chunk_result in chunk_results:
+            if isinstance(chunk_result, dict) and 'verses' in chunk_result:
+                for v in chunk_result['verses']:
+                    ref_key = (v.book, v.chapter, v.start_verse, v.end_verse)
+                    if ref_key not in seen_refs:
+                        seen_refs.add(ref_key)
+                        all_verses.append(v)
+        
+        result['verses'] = all_verses
+        return result
+    
+    def detect_verses_batch(self, texts: List[str], poll_interval: float = BATCH_POLL_INTERVAL) -> List[Dict]:
+        """
+        Detect verses in many documents through the OpenAI Batch API, which
+        costs about half as much as real-time requests but may take up to
+        24 hours; blocks until the batch finishes
+        
+        Args:
+            texts: Documents to analyze
+            poll_interval: Seconds between batch status checks
+            
+        Returns:
+            One result per document, as detect_verses returns it
+        """
+        # One GPT-5 request per chunk of each document
+        chunk_ids = []
+        lines = []
+        for text_index, text in enumerate(texts):
+            ids = []
+            for chunk_index, chunk in enumerate(self._split_chunks(text)):
+                custom_id = f"text-{text_index}-chunk-{chunk_index}"
+                ids.append(custom_id)
+                lines.append(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": "gpt-5",
+                        "messages": self._build_messages(chunk),
+                        "temperature": 1,
+                        "max_completion_tokens": 8000
+                    }
+                }))
+            chunk_ids.append(ids)
+        
+        responses = {}
+        if lines:
+            try:
+                batch_file = self.client.files.create(
+                    file=("verse_batch.jsonl", "\n".join(lines).encode('utf-8')),
+                    purpose="batch"
+                )
+                batch = self.client.batches.create(
+                    input_file_id=batch_file.id,
+                    endpoint="/v1/chat/completions",
+                    completion_window="24h"
+                )
+                print(f"Submitted verse detection batch {batch.id} with {len(lines)} requests")
+                
+                while batch.status not in BATCH_FINAL_STATUSES:
+                    time.sleep(poll_interval)
+                    batch = self.client.batches.retrieve(batch.id)
+                
+                if batch.output_file_id:
+                    output = self.client.files.content(batch.output_file_id).text
+                    for line in output.splitlines():
+                        if line.strip():
+                            item = json.loads(line)
+                            responses[item['custom_id']] = item
+                print(f"Batch {batch.id} {batch.status}: {len(responses)}/{len(lines)} responses")
+                
+            except Exception as e:
+                print(f"Batch verse detection error: {e}")
+        
+        results = []
+        for ids in chunk_ids:
+            chunk_results = []
+            for custom_id in ids:
+                # Failed requests leave their chunk out, as failed chunks do in detect_verses
+                response = (responses.get(custom_id) or {}).get('response') or {}
+                if response.get('status_code') == 200:
+                    content = response['body']['choices'][0]['message']['content']
+                    chunk_results.append(self._parse_llm_response_full(content))
+                else:
+                    chunk_results.append(None)
+            results.append(self._merge_chunk_results(chunk_results))
+        
+        return results
+    
+    def _build_messages(self, text: str) -> List[Dict]:
+        """Build the chat messages asking the LLM to analyze text"""
+        return [
+            {
+                "role": "system", 
+                "content": _SYSTEM_RUBRIC
+            },
+            {
+                "role": "user", 
+                "content": self._build_user_prompt(text)
+            }
+        ]
+    
+    def _build_user_prompt(self, text: str) -> str:
+        """Build the per-document part of the prompt; the rubric is in _SYSTEM_RUBRIC"""
+        return f"""The document starts with:
+{text[:500]}
 
 Text to analyze:
-{text[:3500]}"""
+{text[:PROMPT_TEXT_CHARS]}"""
     
     def _build_simple_prompt(self, text: str) -> str:
         """Simplified prompt for fallback"""
@@ -301,26 +652,9 @@ Text: {text[:4000]}"""
         }
         
         try:
-            # Clean up response
-            if '```json' in content:
-                start_idx = content.find('```json') + 7
-                end_idx = content.find('```', start_idx)
-                json_str = content[start_idx:end_idx].strip()
-            elif '```' in content:
-                start_idx = content.find('```') + 3
-                end_idx = content.find('```', start_idx)
-                json_str = content[start_idx:end_idx].strip()
-                if json_str.startswith(('json', 'JSON')):
-                    json_str = json_str[4:].strip()
-            else:
-                # Find JSON object
-                start_idx = content.find('{')
-                end_idx = content.rfind('}') + 1
-                json_str = content[start_idx:end_idx] if start_idx >= 0 and end_idx > start_idx else ""
+            data = _extract_json(content)
             
-            if json_str:
-                data = json.loads(json_str)
-                
+            if isinstance(data, dict):
                 # Extract metadata
                 if 'metadata' in data:
                     result['metadata'] = data['metadata']
@@ -331,165 +665,82 @@ Text: {text[:4000]}"""
                 
                 # Extract verses
                 if 'verses' in data:
-                    verses = []
-                    for v in data['verses']:
-                        if isinstance(v, dict):
-                            book = v.get('book', '').strip()
-                            chapter = v.get('chapter', 0)
-                            start = v.get('start_verse', 0)
-                            end = v.get('end_verse')
-                            
-                            # Skip invalid entries
-                            if not book or chapter == 0 or start == 0:
-                                continue
-                            
-                            # Normalize book names
-                            book = self._normalize_book_name(book)
-                            
-                            verse = VerseReference(
-                                book=book,
-                                chapter=chapter,
-                                start_verse=start,
-                                end_verse=end,
-                                original_text=v.get('reference', ''),
-                                confidence=0.95,
-                                pattern='pure_llm',
-                                context=v.get('context', '')
-                            )
-                            verses.append(verse)
-                    result['verses'] = verses
+                    result['verses'] = self._build_verse_references(data['verses'])
         
         except Exception as e:
             print(f"Error parsing LLM response: {e}")
-            # Try to fix common JSON issues
-            try:
-                # Remove trailing commas and fix unterminated strings
-                import re
-                json_str = re.sub(r',\s*}', '}', json_str)  # Remove trailing commas before }
-                json_str = re.sub(r',\s*]', ']', json_str)  # Remove trailing commas before ]
-                
-                # Try parsing again
-                data = json.loads(json_str)
-                if 'metadata' in data:
-                    result['metadata'] = data['metadata']
-                if 'outline_structure' in data:
-                    result['outline_structure'] = data['outline_structure']
-                if 'verses' in data:
-                    verses = []
-                    for v in data['verses']:
-                        if isinstance(v, dict):
-                            book = v.get('book', '').strip()
-                            chapter = v.get('chapter', 0)
-                            start = v.get('start_verse', 0)
-                            if book and chapter > 0 and start > 0:
-                                verse = VerseReference(
-                                    book=self._normalize_book_name(book),
-                                    chapter=chapter,
-                                    start_verse=start,
-                                    end_verse=v.get('end_verse'),
-                                    original_text=v.get('reference', ''),
-                                    confidence=0.95,
-                                    pattern='pure_llm',
-                                    context=v.get('context', '')
-                                )
-                                verses.append(verse)
-                    result['verses'] = verses
-            except Exception as e2:
-                print(f"Failed to fix JSON: {e2}")
-                # Try to extract verses using simpler method
-                result['verses'] = self._parse_llm_response(content)
+            # Try to extract verses using simpler method
+            result['verses'] = self._parse_llm_response(content)
         
         return result
     
     def _parse_llm_response(self, content: str) -> List[VerseReference]:
         """Parse the LLM response into VerseReference objects"""
-        verses = []
-        
         try:
-            # Clean up response
-            if '```json' in content:
-                start_idx = content.find('```json') + 7
-                end_idx = content.find('```', start_idx)
-                json_str = content[start_idx:end_idx].strip()
-            elif '```' in content:
-                start_idx = content.find('```') + 3
-                end_idx = content.find('```', start_idx)
-                json_str = content[start_idx:end_idx].strip()
-                if json_str.startswith(('json', 'JSON')):
-                    json_str = json_str[4:].strip()
-            else:
-                # Find JSON array
-                start_idx = content.find('[')
-                end_idx = content.rfind(']') + 1
-                json_str = content[start_idx:end_idx] if start_idx >= 0 and end_idx > start_idx else ""
-            
-            if json_str:
-                verse_data = json.loads(json_str)
+            verse_data = _extract_json(content, brackets='[]')
+            if verse_data:
+                return self._build_verse_references(verse_data)
+        
+        except Exception as e:
+            print(f"Error parsing LLM response: {e}")
+        
+        return []
+    
+    def _build_verse_references(self, items: List[Any]) -> List[VerseReference]:
+        """
+        Build VerseReference objects from parsed verse entries, skipping invalid
+        ones; the LLM returns ranges compactly, and each is expanded here into
+        one VerseReference per verse
+        """
+        verses = []
+        for v in items:
+            if isinstance(v, dict):
+                book = v.get('book', '').strip()
+                chapter = v.get('chapter', 0)
+                start = v.get('start_verse', 0)
+                end = v.get('end_verse')
+                
+                # Skip invalid entries
+                if not book or chapter == 0 or start == 0:
+                    continue
                 
-                for v in verse_data:
-                    if isinstance(v, dict):
-                        book = v.get('book', '').strip()
-                        chapter = v.get('chapter', 0)
-                        start = v.get('start_verse', 0)
-                        end = v.get('end_verse')
-                        
-                        # Skip invalid entries
-                        if not book or chapter == 0 or start == 0:
-                            continue
-                        
-                        # Normalize book names
-                        book = self._normalize_book_name(book)
-                        
-                        verse = VerseReference(
+                # Normalize book names
+                book = self._normalize_book_name(book)
+                
+                original_text = v.get('reference', '')
+                context = v.get('context', '')
+                if (isinstance(start, int) and isinstance(end, int)
+                        and start < end < start + MAX_RANGE_VERSES):
+                    verses.extend(
+                        VerseReference(
                             book=book,
                             chapter=chapter,
-                            start_verse=start,
-                            end_verse=end,
-                            original_text=v.get('reference', ''),
+                            start_verse=verse_num,
+                            end_verse=None,
+                            original_text=original_text,
                             confidence=0.95,
                             pattern='pure_llm',
-                            context=v.get('context', '')
+                            context=context
                         )
-                        verses.append(verse)
-        
-        except Exception as e:
-            print(f"Error parsing LLM response: {e}")
+                        for verse_num in range(start, end + 1)
+                    )
+                    continue
+                
+                verse = VerseReference(
+                    book=book,
+                    chapter=chapter,
+                    start_verse=start,
+                    end_verse=end,
+                    original_text=original_text,
+                    confidence=0.95,
+                    pattern='pure_llm',
+                    context=context
+                )
+                verses.append(verse)
         
         return verses
     
     def _normalize_book_name(self, book: str) -> str:
         """Normalize book names to standard format"""
-        book = book.replace('.', '').strip()
-        
-        # Common abbreviations to full names
-        book_map = {
-            'Rom': 'Romans', 'Matt': 'Matthew', 'Mk': 'Mark', 'Lk': 'Luke',
-            'Jn': 'John', '1 Cor': '1 Corinthians', '2 Cor': '2 Corinthians',
-            'Gal': 'Galatians', 'Eph': 'Ephesians', 'Phil': 'Philippians',
-            'Col': 'Colossians', '1 Thess': '1 Thessalonians', '2 Thess': '2 Thessalonians',
-            '1 Tim': '1 Timothy', '2 Tim': '2 Timothy', 'Tit': 'Titus',
-            'Philem': 'Philemon', 'Heb': 'Hebrews', 'Jas': 'James',
-            '1 Pet': '1 Peter', '2 Pet': '2 Peter', '1 Jn': '1 John',
-            '2 Jn': '2 John', '3 Jn': '3 John', 'Rev': 'Revelation',
-            'Gen': 'Genesis', 'Ex': 'Exodus', 'Lev': 'Leviticus', 'Num': 'Numbers',
-            'Deut': 'Deuteronomy', 'Josh': 'Joshua', 'Judg': 'Judges',
-            '1 Sam': '1 Samuel', '2 Sam': '2 Samuel', 'Ps': 'Psalms', 'Psalm': 'Psalms',
-            'Prov': 'Proverbs', 'Eccl': 'Ecclesiastes', 'Song': 'Song of Solomon',
-            'Isa': 'Isaiah', 'Jer': 'Jeremiah', 'Lam': 'Lamentations',
-            'Ezek': 'Ezekiel', 'Dan': 'Daniel', 'Hos': 'Hosea', 'Obad': 'Obadiah',
-            'Mic': 'Micah', 'Nah': 'Nahum', 'Hab': 'Habakkuk', 'Zeph': 'Zephaniah',
-            'Hag': 'Haggai', 'Zech': 'Zechariah', 'Mal': 'Malachi'
-        }
-        
-        # First try exact match
-        if book in book_map:
-            return book_map[book]
-        
-        # Try without spaces
-        book_no_space = book.replace(' ', '')
-        for abbr, full in book_map.items():
-            if abbr.replace(' ', '') == book_no_space:
-                return full
-        
-        # Return as-is if not found
-        return book
\ No newline at end of file
+        key = book.replace('.', '').strip()
+        return _CANON.get(key) or _CANON.get(key.replace(' ', '').lower(), key)
@@ -6,45 +6,142 @@ Stores session data in SQLite database to survive server restarts
 import json
 import sqlite3
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+
+# orjson and zstandard make session payloads faster to encode and smaller
+# to store; without them payloads are stored as uncompressed json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Connection settings applied once when the database is opened: WAL lets
+# reads run alongside a write and, with synchronous=NORMAL, commits no
+# longer wait on an fsync each
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+)
+
+# Recently used sessions kept in process, as encoded payloads, and how many
+# seconds one is served before it is read from SQLite again; kept short as
+# other processes may write the same database file
+SESSION_CACHE_SIZE = 1024
+SESSION_CACHE_TTL = 5
+
+# Most LLM results kept in the llm_cache table; the oldest go first
+LLM_CACHE_MAX_ROWS = 5000
+
+# Session payload encodings, stored alongside the data
+ENCODING_JSON = 0
+ENCODING_ZSTD_JSON = 1
+
+# Payloads at least this large are compressed
+COMPRESS_MIN_BYTES = 1024
+
+
+def _encode_session(data: Dict[str, Any]) -> Tuple[bytes, int]:
+    """Serialize session data to JSON bytes, compressing large payloads"""
+    if ORJSON_AVAILABLE:
+        # Datetimes go through default=str, as they do with json
+        payload = orjson.dumps(data, default=str,
+                               option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+    else:
+        payload = json.dumps(data, default=str).encode('utf-8')
+
+    if ZSTD_AVAILABLE and len(payload) >= COMPRESS_MIN_BYTES:
+        return zstandard.ZstdCompressor(level=3).compress(payload), ENCODING_ZSTD_JSON
+    return payload, ENCODING_JSON
+
+
+def _decode_session(payload, encoding: int) -> Dict[str, Any]:
+    """Deserialize session data stored by _encode_session, or JSON text from older rows"""
+    if encoding == ENCODING_ZSTD_JSON:
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    return orjson.loads(payload) if ORJSON_AVAILABLE else json.loads(payload)
 
 class SessionManager:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, enable_cache: bool = True):
         """
         Initialize session manager with SQLite database
         
         Args:
             db_path: Path to session database (creates if not exists)
+            enable_cache: Serve recently used sessions from process memory
         """
         if db_path is None:
             db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'sessions.db')
         
         self.db_path = db_path
+        
+        # One connection is kept open and shared by every call; statements
+        # commit on their own and use of the connection is serialized
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        for pragma in SQLITE_PRAGMAS:
+            self._conn.execute(pragma)
+        
+        # session_id -> (stored_at, payload, encoding), least recently used first
+        self._cache = OrderedDict() if enable_cache else None
+        self._cache_lock = threading.Lock()
         self._init_database()
         
     def _init_database(self):
         """Initialize the session database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                session_id TEXT PRIMARY KEY,
-                data TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create index for faster queries
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_sessions_updated 
-            ON sessions(updated_at)
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    encoding INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Tables created before payloads were binary hold JSON text in a
+            # TEXT column; SQLite stores blobs written there unchanged, so
+            # those rows only need marking as plain JSON
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(sessions)')}
+            if 'encoding' not in columns:
+                self._conn.execute('''
+                    ALTER TABLE sessions ADD COLUMN encoding INTEGER NOT NULL DEFAULT 0
+                ''')
+            
+            # Create index for faster queries
+            self._conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sessions_updated 
+                ON sessions(updated_at)
+            ''')
+            
+            # Parsed LLM detection results by hash of the request, per model
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    text_sha256 TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    result BLOB NOT NULL,
+                    encoding INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (text_sha256, model)
+                )
+            ''')
+            self._conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_llm_cache_created 
+                ON llm_cache(created_at)
+            ''')
         
     def save_session(self, session_id: str, data: Dict[str, Any]):
         """
@@ -54,19 +151,43 @@ class SessionManager:
             session_id: Unique session identifier
             data: Session data to store
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Convert data to JSON bytes, handling special types
+        payload, encoding = _encode_session(data)
+        
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO sessions (session_id, data, encoding, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (session_id, payload, encoding))
+            # Cached under the same lock as the write, so a concurrent
+            # get_session can't put an older row back over it
+            self._cache_put(session_id, payload, encoding)
         
-        # Convert data to JSON, handling special types
-        json_data = json.dumps(data, default=str)
+    def save_sessions(self, items: Dict[str, Dict[str, Any]]):
+        """
+        Save many sessions to database in one transaction
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO sessions (session_id, data, updated_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        ''', (session_id, json_data))
+        Args:
+            items: Session data to store, by session identifier
+        """
+        rows = [(session_id, *_encode_session(data)) for session_id, data in items.items()]
         
-        conn.commit()
-        conn.close()
+        with self._lock:
+            # The connection commits each statement on its own, so the batch
+            # is wrapped explicitly to commit once
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany('''
+                    INSERT OR REPLACE INTO sessions (session_id, data, encoding, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ''', rows)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            
+            for session_id, payload, encoding in rows:
+                self._cache_put(session_id, payload, encoding)
         
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -78,18 +199,21 @@ class SessionManager:
         Returns:
             Session data or None if not found
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT data FROM sessions WHERE session_id = ?
-        ''', (session_id,))
+        # The cache holds the encoded payload, so every caller still gets
+        # its own copy of the data
+        cached = self._cache_get(session_id)
+        if cached is not None:
+            return _decode_session(*cached)
         
-        result = cursor.fetchone()
-        conn.close()
+        with self._lock:
+            result = self._conn.execute('''
+                SELECT data, encoding FROM sessions WHERE session_id = ?
+            ''', (session_id,)).fetchone()
+            if result:
+                self._cache_put(session_id, result[0], result[1])
         
         if result:
-            return json.loads(result[0])
+            return _decode_session(result[0], result[1])
         return None
         
     def delete_session(self, session_id: str):
@@ -99,15 +223,11 @@ class SessionManager:
         Args:
             session_id: Session identifier
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM sessions WHERE session_id = ?
-        ''', (session_id,))
-        
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._conn.execute('''
+                DELETE FROM sessions WHERE session_id = ?
+            ''', (session_id,))
+            self._cache_discard(session_id)
         
     def cleanup_old_sessions(self, hours: int = 24):
         """
@@ -116,21 +236,19 @@ class SessionManager:
         Args:
             hours: Number of hours to keep sessions
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         cutoff_time = datetime.now() - timedelta(hours=hours)
         
-        cursor.execute('''
-            DELETE FROM sessions 
-            WHERE updated_at < ?
-        ''', (cutoff_time,))
-        
-        deleted = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with self._lock:
+            cursor = self._conn.execute('''
+                DELETE FROM sessions 
+                WHERE updated_at < ?
+            ''', (cutoff_time,))
+            
+            # Any cached session may have been among those removed
+            if cursor.rowcount:
+                self._cache_discard()
         
-        return deleted
+        return cursor.rowcount
         
     def session_exists(self, session_id: str) -> bool:
         """
@@ -142,14 +260,95 @@ class SessionManager:
         Returns:
             True if session exists, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._lock:
+            result = self._conn.execute('''
+                SELECT 1 FROM sessions WHERE session_id = ? LIMIT 1
+            ''', (session_id,)).fetchone()
+        
+        return result is not None
         
-        cursor.execute('''
-            SELECT 1 FROM sessions WHERE session_id = ? LIMIT 1
-        ''', (session_id,))
+    def get_llm_result(self, text_sha256: str, models: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a cached LLM result
+        
+        Args:
+            text_sha256: Hash of the LLM request
+            models: Models whose results are accepted, most preferred first
+            
+        Returns:
+            Result of the most preferred model cached, or None if none is
+        """
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT model, result, encoding FROM llm_cache WHERE text_sha256 = ?
+            ''', (text_sha256,)).fetchall()
+        
+        by_model = {row[0]: row for row in rows}
+        for model in models:
+            if model in by_model:
+                return _decode_session(by_model[model][1], by_model[model][2])
+        return None
+        
+    def save_llm_result(self, text_sha256: str, model: str, result: Dict[str, Any]):
+        """
+        Cache an LLM result, dropping the oldest beyond LLM_CACHE_MAX_ROWS
+        
+        Args:
+            text_sha256: Hash of the LLM request
+            model: Model that produced the result
+            result: JSON-serializable result
+        """
+        payload, encoding = _encode_session(result)
         
-        result = cursor.fetchone()
-        conn.close()
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO llm_cache (text_sha256, model, result, encoding, created_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (text_sha256, model, payload, encoding))
+            self._conn.execute('''
+                DELETE FROM llm_cache WHERE rowid IN (
+                    SELECT rowid FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (LLM_CACHE_MAX_ROWS,))
         
-        return result is not None
\ No newline at end of file
+    def _cache_get(self, session_id: str) -> Optional[Tuple[bytes, int]]:
+        """Get a cached session payload that has not expired"""
+        if self._cache is None:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(session_id)
+            if entry is None:
+                return None
+            stored_at, payload, encoding = entry
+            if time.monotonic() - stored_at > SESSION_CACHE_TTL:
+                del self._cache[session_id]
+                return None
+            self._cache.move_to_end(session_id)
+            return payload, encoding
+    
+    def _cache_put(self, session_id: str, payload: bytes, encoding: int):
+        """Cache a session payload, evicting the least recently used beyond the cap"""
+        if self._cache is None:
+            return
+        with self._cache_lock:
+            self._cache[session_id] = (time.monotonic(), payload, encoding)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > SESSION_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    def _cache_discard(self, session_id: str = None):
+        """Drop one session from the cache, or all of them"""
+        if self._cache is None:
+            return
+        with self._cache_lock:
+            if session_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(session_id, None)
+    
+    def close(self):
+        """Close the shared database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -10,16 +10,58 @@ from docx import Document
 from typing import Dict, List, Optional, Any
 import sys
 import re
+from collections import OrderedDict
 
 # Add the src directory to the path for imports
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from utils.smart_verse_parser import SmartVerseParser
 
+# Most document sessions kept in memory; the least recently used is
+# dropped once there are more
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE', '64'))
+
+# PyMuPDF span flags for bold and italic fonts
+_BOLD_FLAG = 1 << 4
+_ITAL_FLAG = 1 << 1
+
+# Text extraction flags for PDF pages; only text spans are used, so images
+# are left out of the page dict
+_PDF_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Runs of spaces within a line
+_WHITESPACE_RE = re.compile(r' +')
+
+# Bold markers added during extraction and outline point markers at the
+# start of each line, converted to HTML in a single pass
+_FORMAT_RE = re.compile(
+    r'\*\*(?P<bold>.*?)\*\*'
+    r'|^(?:(?P<roman>\s*[IVX]+\.\s+)|(?P<outline>\s*[A-Z]\.\s+)|(?P<numbered>\s*\d+\.\s+))',
+    re.MULTILINE
+)
+_FORMAT_TAGS = {
+    'bold': '<strong>{}</strong>',
+    'roman': '<strong class="roman-numeral">{}</strong>',
+    'outline': '<strong class="outline-point">{}</strong>',
+    'numbered': '<strong class="numbered-point">{}</strong>',
+}
+
+# Italic markers added during extraction; converted after bold so that
+# bold italic runs (***text***) pair up as before
+_ITAL_RE = re.compile(r'\*(.*?)\*')
+
+# HTML tags added for display, stripped again on export
+_ANY_TAG_RE = re.compile(r'<[^>]*>')
+
+# Three or more line breaks, possibly with whitespace between
+_MULTI_BLANK_RE = re.compile(r'\n\s*\n\s*\n')
+
 class SmartDocumentProcessor:
     def __init__(self, db_path: str):
         self.verse_parser = SmartVerseParser(db_path)
-        self.sessions = {}
+        
+        # session_id -> session data, least recently used first
+        self.sessions = OrderedDict()
     
     def upload_document(self, file_path: str, filename: str) -> Dict[str, Any]:
         """
@@ -39,18 +81,20 @@ class SmartDocumentProcessor:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
             
-            # Find verse references
-            references = self.verse_parser.find_verse_references(content)
+            # Find verse references, keeping the segments for verse insertion
+            segments = self.verse_parser._split_into_segments(content)
+            references = self.verse_parser.find_verse_references(content, segments)
             resolved_references = self.verse_parser.resolve_context_references(references, content)
             
             # Store session data
-            self.sessions[session_id] = {
+            self._store_session(session_id, {
                 'original_content': content,
                 'original_filename': filename,
+                'segments': segments,
                 'references': resolved_references,
                 'populated_content': None,
                 'stats': self._calculate_stats(resolved_references)
-            }
+            })
             
             return {
                 'success': True,
@@ -73,43 +117,47 @@ class SmartDocumentProcessor:
         """
         Extract text from PDF while preserving basic formatting cues
         """
-        text = ""
+        parts = []
         try:
             doc = fitz.open(file_path)
             for page in doc:
                 # Get text with formatting information
-                blocks = page.get_text("dict")
+                blocks = page.get_text("dict", flags=_PDF_TEXT_FLAGS)["blocks"]
                 
-                for block in blocks["blocks"]:
-                    if "lines" in block:
-                        for line in block["lines"]:
-                            line_text = ""
-                            for span in line["spans"]:
-                                span_text = span["text"]
-                                font_size = span["size"]
-                                font_flags = span["flags"]
-                                
-                                # Detect formatting based on font properties
-                                is_bold = font_flags & 2**4  # Bold flag
-                                is_italic = font_flags & 2**1  # Italic flag
-                                
-                                # Add formatting markers for preservation
-                                if is_bold and font_size > 12:
-                                    span_text = f"**{span_text}**"  # Mark as bold heading
-                                elif is_italic:
-                                    span_text = f"*{span_text}*"  # Mark as italic
-                                
-                                line_text += span_text
+                for block in blocks:
+                    lines = block.get("lines")
+                    if lines is None:
+                        continue
+                    
+                    for line in lines:
+                        line_parts = []
+                        for span in line["spans"]:
+                            span_text = span["text"]
+                            font_size = span["size"]
+                            font_flags = span["flags"]
+                            
+                            # Detect formatting based on font properties
+                            is_bold = font_flags & _BOLD_FLAG
+                            is_italic = font_flags & _ITAL_FLAG
+                            
+                            # Add formatting markers for preservation
+                            if is_bold and font_size > 12:
+                                span_text = f"**{span_text}**"  # Mark as bold heading
+                            elif is_italic:
+                                span_text = f"*{span_text}*"  # Mark as italic
                             
-                            if line_text.strip():
-                                text += line_text + "\n"
-                        text += "\n"  # Add line break between blocks
+                            line_parts.append(span_text)
+                        
+                        line_text = "".join(line_parts)
+                        if line_text.strip():
+                            parts.append(line_text + "\n")
+                    parts.append("\n")  # Add line break between blocks
             
             doc.close()
         except Exception as e:
             raise Exception(f"Error extracting PDF text: {str(e)}")
         
-        return self._clean_extracted_text(text)
+        return self._clean_extracted_text("".join(parts))
     
     def _extract_docx_with_formatting(self, file_path: str) -> str:
         """
@@ -117,10 +165,10 @@ class SmartDocumentProcessor:
         """
         try:
             doc = Document(file_path)
-            text = ""
+            parts = []
             
             for paragraph in doc.paragraphs:
-                para_text = ""
+                para_parts = []
                 
                 for run in paragraph.runs:
                     run_text = run.text
@@ -131,12 +179,13 @@ class SmartDocumentProcessor:
                     if run.italic:
                         run_text = f"*{run_text}*"
                     
-                    para_text += run_text
+                    para_parts.append(run_text)
                 
+                para_text = "".join(para_parts)
                 if para_text.strip():
-                    text += para_text + "\n"
+                    parts.append(para_text + "\n")
             
-            return self._clean_extracted_text(text)
+            return self._clean_extracted_text("".join(parts))
             
         except Exception as e:
             raise Exception(f"Error extracting DOCX text: {str(e)}")
@@ -145,20 +194,15 @@ class SmartDocumentProcessor:
         """
         Clean extracted text while preserving important formatting
         """
-        # Remove excessive whitespace but preserve structure
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            # Remove excessive spaces within lines
-            cleaned_line = re.sub(r' +', ' ', line.strip())
-            cleaned_lines.append(cleaned_line)
-        
-        # Remove excessive empty lines but preserve paragraph breaks
+        # Remove excessive whitespace but preserve structure, in one pass
         result_lines = []
         empty_count = 0
         
-        for line in cleaned_lines:
+        for line in text.split('\n'):
+            # Remove excessive spaces within lines
+            line = _WHITESPACE_RE.sub(' ', line.strip())
+            
+            # Remove excessive empty lines but preserve paragraph breaks
             if not line:
                 empty_count += 1
                 if empty_count <= 2:  # Allow max 2 consecutive empty lines
@@ -173,19 +217,19 @@ class SmartDocumentProcessor:
         """
         Process document with smart verse insertion
         """
-        if session_id not in self.sessions:
+        session_data = self.get_session_data(session_id)
+        if session_data is None:
             return {
                 'success': False,
                 'error': 'Session not found'
             }
         
         try:
-            session_data = self.sessions[session_id]
             original_content = session_data['original_content']
             references = session_data['references']
             
             # Use smart verse insertion
-            populated_content = self.verse_parser.insert_verses_smartly(original_content, references)
+            populated_content = self.verse_parser.insert_verses_smartly(original_content, references, session_data.get('segments'))
             
             # Convert formatting markers to HTML for display
             populated_content = self._convert_formatting_to_html(populated_content)
@@ -220,18 +264,11 @@ class SmartDocumentProcessor:
         """
         Convert formatting markers to HTML while preserving structure
         """
-        # Convert bold markers to HTML
-        text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
+        # Convert bold markers, Roman numerals and outline points to HTML
+        text = _FORMAT_RE.sub(lambda m: _FORMAT_TAGS[m.lastgroup].format(m.group(m.lastgroup)), text)
         
         # Convert italic markers to HTML
-        text = re.sub(r'\*(.*?)\*', r'<em>\1</em>', text)
-        
-        # Detect and format Roman numerals
-        text = re.sub(r'^(\s*[IVX]+\.\s+)', r'<strong class="roman-numeral">\1</strong>', text, flags=re.MULTILINE)
-        
-        # Detect and format outline points
-        text = re.sub(r'^(\s*[A-Z]\.\s+)', r'<strong class="outline-point">\1</strong>', text, flags=re.MULTILINE)
-        text = re.sub(r'^(\s*\d+\.\s+)', r'<strong class="numbered-point">\1</strong>', text, flags=re.MULTILINE)
+        text = _ITAL_RE.sub(r'<em>\1</em>', text)
         
         return text
     
@@ -269,33 +306,38 @@ class SmartDocumentProcessor:
         """
         Get session data
         """
-        return self.sessions.get(session_id)
+        session_data = self.sessions.get(session_id)
+        if session_data is not None:
+            self.sessions.move_to_end(session_id)
+        return session_data
+    
+    def _store_session(self, session_id: str, session_data: Dict):
+        """
+        Store session data, dropping the least recently used beyond SESSION_CACHE_SIZE
+        """
+        self.sessions[session_id] = session_data
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > SESSION_CACHE_SIZE:
+            self.sessions.popitem(last=False)
     
     def export_clean_text(self, session_id: str) -> Optional[str]:
         """
         Export clean text without HTML tags for OneNote
         """
-        if session_id not in self.sessions:
+        session_data = self.get_session_data(session_id)
+        if session_data is None:
             return None
         
-        populated_content = self.sessions[session_id].get('populated_content')
+        populated_content = session_data.get('populated_content')
         if not populated_content:
             return None
         
-        # Remove HTML tags but keep content
-        clean_text = populated_content
-        
-        # Remove verse span tags but keep content
-        clean_text = re.sub(r'<span class=[\'"]verse-ref[\'"]>(.*?)</span>', r'\1', clean_text)
-        clean_text = re.sub(r'<span class=[\'"]verse-text[\'"]>(.*?)</span>', r'\1', clean_text)
-        
-        # Remove other HTML tags but keep content
-        clean_text = re.sub(r'<strong[^>]*>(.*?)</strong>', r'\1', clean_text)
-        clean_text = re.sub(r'<em>(.*?)</em>', r'\1', clean_text)
-        clean_text = re.sub(r'<[^>]*>', '', clean_text)
+        # Remove HTML tags but keep content; verse, strong and em tags
+        # all wrap text that stays, so one pass over any tag does
+        clean_text = _ANY_TAG_RE.sub('', populated_content)
         
         # Clean up whitespace
-        clean_text = re.sub(r'\n\s*\n\s*\n', '\n\n', clean_text)
+        clean_text = _MULTI_BLANK_RE.sub('\n\n', clean_text)
         
         return clean_text.strip()
 
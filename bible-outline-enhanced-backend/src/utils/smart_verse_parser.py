@@ -6,6 +6,8 @@ Inserts verses only at appropriate break points while maintaining original struc
 import re
 import os
 import sys
+from collections import defaultdict
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 
 # Add the src directory to the path for imports
@@ -13,10 +15,52 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from utils.sqlite_bible_database import SQLiteBibleDatabase
 
+# Verse ranges remembered per parser; verse text never changes
+VERSE_CACHE_SIZE = 8192
+
+# Outline point markers at the start of a line: roman numerals (I.),
+# capital letters (A.), numbers (1.) and lowercase letters (a.)
+_LINE_TYPE_RE = re.compile(r'^(?:[IVX]+|[A-Z]|\d+|[a-z])\.\s+')
+
+# Roman numeral markers, allowing leading whitespace
+_ROMAN_LINE_RE = re.compile(r'^\s*[IVX]+\.\s+')
+
+# Quoted text, usually book titles or emphasis
+_QUOTED_RE = re.compile(r'["""].*?["""]')
+
+# Sentence-ending punctuation followed by a space, capturing the character
+# after it; a sentence ends there if that character is uppercase
+_SENTENCE_END_RE = re.compile(r'[.!?](?= (\S))')
+
+# Common abbreviations that end in a period without ending the sentence
+_ABBREVS = ('cf.', 'v.', 'vv.', 'vs.', 'ch.', 'chap.', 'etc.', 'i.e.', 'e.g.')
+
+# Every verse reference contains a digit; segments without one are not
+# scanned for references
+_DIGIT_RE = re.compile(r'\d')
+
+# Verse references, one alternative per kind and matched in a single pass:
+# full references with optional "cf." prefix, verse-only references (v. or
+# vv.) and chapter:verse ranges within the same book. %s is filled with the
+# alternation of known book names, so only real books start a full reference
+_REFERENCE_PATTERN = (
+    r'(?P<full>(?:cf\.\s+)?\b(?P<book>(?:%s)\.?)\s+(?P<chapter>\d+):(?P<start>\d+)(?:-(?P<end>\d+))?'
+    r'(?:\s*[,;]\s*\d+:\d+(?:-\d+)?)*)'
+    r'|(?P<vonly>v{1,2}\.\s*(?P<v_start>\d+)(?:-(?P<v_end>\d+))?)'
+    r'|(?P<range>(?P<r_chapter>\d+):(?P<r_start>\d+)-(?P<r_end>\d+))'
+)
+
+def _book_key(name: str) -> str:
+    """Normalize a book name or abbreviation as matched in text, for lookup"""
+    return ''.join(name.split()).replace('.', '').lower()
+
 class SmartVerseParser:
     def __init__(self, db_path: str):
         self.db = SQLiteBibleDatabase(db_path)
         
+        # The same references recur within and across documents
+        self._lookup_verses_range = lru_cache(maxsize=VERSE_CACHE_SIZE)(self.db.lookup_verses_range)
+        
         # Book abbreviation mapping
         self.book_abbreviations = {
             'Gen': 'Genesis', 'Exo': 'Exodus', 'Lev': 'Leviticus', 'Num': 'Numbers', 'Deut': 'Deuteronomy',
@@ -35,25 +79,43 @@ class SmartVerseParser:
             'Philem': 'Philemon', 'Heb': 'Hebrews', 'James': 'James', '1 Pet': '1 Peter', '2 Pet': '2 Peter',
             '1 John': '1 John', '2 John': '2 John', '3 John': '3 John', 'Jude': 'Jude', 'Rev': 'Revelation'
         }
-        
-        # Patterns for different types of verse references
-        self.reference_patterns = [
-            # Full references with optional "cf." prefix
-            r'(?:cf\.\s+)?([123]?\s*[A-Za-z]+\.?)\s+(\d+):(\d+)(?:-(\d+))?(?:\s*[,;]\s*(\d+):(\d+)(?:-(\d+))?)*',
-            # Verse-only references (v. or vv.)
-            r'v{1,2}\.\s*(\d+)(?:-(\d+))?',
-            # Chapter:verse ranges within same book
-            r'(\d+):(\d+)-(\d+)',
-        ]
+        self._reverse_abbrev = {v: k for k, v in self.book_abbreviations.items()}
+        
+        # Abbreviations and full names start a reference, in any case; the
+        # database's other abbreviations only as stored, as lookup_verse
+        # matches them, so words such as "is" or "he" are not taken for books
+        books = {book['name']: book['name'] for book in self.db.get_all_books()}
+        books.update({name: name for name in self.book_abbreviations.values()})
+        books.update(self.book_abbreviations)
+        known_names = {name.lower() for name in books}
+        exact_books = {}
+        for abbrev, name in self.db.get_book_abbreviations():
+            if abbrev.lower() not in known_names:
+                exact_books.setdefault(abbrev, name)
+        
+        self._book_names = {_book_key(name): book for name, book in exact_books.items()}
+        self._book_names.update({_book_key(name): book for name, book in books.items()})
+        
+        # Longest first so the alternation prefers "Philem" over "Phil";
+        # spaces after a book number are optional as before ("1 Cor", "1Cor")
+        book_patterns = []
+        for name in sorted({**books, **exact_books}, key=lambda name: (len(name), name), reverse=True):
+            pattern = r'\s*'.join(re.escape(part) for part in name.split())
+            book_patterns.append(f'(?-i:{pattern})' if name in exact_books else pattern)
+        books_alt = '|'.join(book_patterns)
+        self._reference_re = re.compile(_REFERENCE_PATTERN % books_alt, re.IGNORECASE)
     
-    def find_verse_references(self, text: str) -> List[Dict]:
+    def find_verse_references(self, text: str, segments: Optional[List[Dict]] = None) -> List[Dict]:
         """
         Find all verse references in text with their positions and context
+        
+        Segments already split from text by _split_into_segments can be passed in
         """
         references = []
         
         # Split text into logical segments (sentences, clauses)
-        segments = self._split_into_segments(text)
+        if segments is None:
+            segments = self._split_into_segments(text)
         
         for segment_idx, segment in enumerate(segments):
             segment_refs = self._find_references_in_segment(segment, segment_idx)
@@ -111,20 +173,9 @@ class SmartVerseParser:
         """
         stripped = line.strip()
         
-        # Roman numerals (I., II., III., etc.)
-        if re.match(r'^[IVX]+\.\s+', stripped):
-            return 'outline_point'
-        
-        # Capital letters (A., B., C., etc.)
-        if re.match(r'^[A-Z]\.\s+', stripped):
-            return 'outline_point'
-        
-        # Numbers (1., 2., 3., etc.)
-        if re.match(r'^\d+\.\s+', stripped):
-            return 'outline_point'
-        
-        # Lowercase letters (a., b., c., etc.)
-        if re.match(r'^[a-z]\.\s+', stripped):
+        # Roman numerals, capital letters, numbers or lowercase letters
+        # (I., A., 1., a., etc.)
+        if _LINE_TYPE_RE.match(stripped):
             return 'outline_point'
         
         # Headings (all caps, or title case without periods)
@@ -144,12 +195,12 @@ class SmartVerseParser:
         }
         
         # Detect Roman numerals (should be bold and larger)
-        if re.match(r'^\s*[IVX]+\.\s+', line.strip()):
+        if _ROMAN_LINE_RE.match(line.strip()):
             formatting['bold'] = True
             formatting['size'] = 'large'
         
         # Detect italicized text (usually book titles or emphasis)
-        if re.search(r'["""].*?["""]', line) or 'cf.' in line:
+        if _QUOTED_RE.search(line) or 'cf.' in line:
             formatting['italic'] = True
         
         return formatting
@@ -160,32 +211,21 @@ class SmartVerseParser:
         """
         # Simple sentence splitting that's aware of common abbreviations
         sentences = []
-        current = ""
+        start = 0
         
-        i = 0
-        while i < len(text):
-            char = text[i]
-            current += char
-            
-            if char in '.!?':
-                # Look ahead to see if this is end of sentence
-                if i + 1 < len(text):
-                    next_char = text[i + 1]
-                    # If followed by space and capital letter, likely end of sentence
-                    if next_char == ' ' and i + 2 < len(text) and text[i + 2].isupper():
-                        # But check for common abbreviations
-                        if not self._is_abbreviation(current.strip()):
-                            sentences.append(current.strip())
-                            current = ""
-                else:
-                    # End of text
-                    sentences.append(current.strip())
-                    current = ""
+        for match in _SENTENCE_END_RE.finditer(text):
+            # If followed by space and capital letter, likely end of sentence
+            if not match.group(1).isupper():
+                continue
             
-            i += 1
+            # But check for common abbreviations
+            sentence = text[start:match.end()].strip()
+            if not self._is_abbreviation(sentence):
+                sentences.append(sentence)
+                start = match.end()
         
-        if current.strip():
-            sentences.append(current.strip())
+        # The rest of the text is the last sentence
+        sentences.append(text[start:].strip())
         
         return [s for s in sentences if s]
     
@@ -193,8 +233,7 @@ class SmartVerseParser:
         """
         Check if text ends with a common abbreviation
         """
-        abbrevs = ['cf.', 'v.', 'vv.', 'vs.', 'ch.', 'chap.', 'etc.', 'i.e.', 'e.g.']
-        return any(text.lower().endswith(abbrev) for abbrev in abbrevs)
+        return text.lower().endswith(_ABBREVS)
     
     def _find_references_in_segment(self, segment: Dict, segment_idx: int) -> List[Dict]:
         """
@@ -202,13 +241,14 @@ class SmartVerseParser:
         """
         references = []
         text = segment['text']
+        if not _DIGIT_RE.search(text):
+            return references
         
-        # Find all reference patterns
-        for pattern in self.reference_patterns:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                ref_info = self._parse_reference_match(match, segment, segment_idx)
-                if ref_info:
-                    references.append(ref_info)
+        # Find all reference kinds in one scan
+        for match in self._reference_re.finditer(text):
+            ref_info = self._parse_reference_match(match, segment, segment_idx)
+            if ref_info:
+                references.append(ref_info)
         
         return references
     
@@ -216,16 +256,15 @@ class SmartVerseParser:
         """
         Parse a regex match into reference information
         """
-        groups = match.groups()
+        kind = match.lastgroup
         
         # Handle different pattern types
-        if len(groups) >= 3 and groups[0] and groups[1] and groups[2]:
+        if kind == 'full':
             # Full reference pattern
-            book_abbrev = groups[0].strip().replace('.', '')
-            book_name = self.book_abbreviations.get(book_abbrev, book_abbrev)
-            chapter = int(groups[1])
-            start_verse = int(groups[2])
-            end_verse = int(groups[3]) if groups[3] else start_verse
+            book_name = self._book_names[_book_key(match.group('book'))]
+            chapter = int(match.group('chapter'))
+            start_verse = int(match.group('start'))
+            end_verse = int(match.group('end')) if match.group('end') else start_verse
             
             return {
                 'type': 'full_reference',
@@ -240,10 +279,10 @@ class SmartVerseParser:
                 'insert_after_segment': True  # Insert after complete segment
             }
         
-        elif len(groups) >= 1 and groups[0]:
+        elif kind == 'vonly':
             # Verse-only reference (needs context)
-            start_verse = int(groups[0])
-            end_verse = int(groups[1]) if len(groups) > 1 and groups[1] else start_verse
+            start_verse = int(match.group('v_start'))
+            end_verse = int(match.group('v_end')) if match.group('v_end') else start_verse
             
             return {
                 'type': 'verse_only',
@@ -257,6 +296,21 @@ class SmartVerseParser:
                 'insert_after_segment': True
             }
         
+        elif kind == 'range':
+            # Chapter and verses without a book (needs the book from context)
+            return {
+                'type': 'verse_only',
+                'chapter': int(match.group('r_chapter')),
+                'start_verse': int(match.group('r_start')),
+                'end_verse': int(match.group('r_end')),
+                'original_text': match.group(0),
+                'position': match.span(),
+                'segment_idx': segment_idx,
+                'segment': segment,
+                'needs_context': True,
+                'insert_after_segment': True
+            }
+        
         return None
     
     def resolve_context_references(self, references: List[Dict], text: str) -> List[Dict]:
@@ -279,7 +333,7 @@ class SmartVerseParser:
                 resolved_ref.update({
                     'type': 'resolved_reference',
                     'book': current_book,
-                    'chapter': current_chapter
+                    'chapter': ref.get('chapter', current_chapter)
                 })
                 resolved.append(resolved_ref)
             
@@ -289,20 +343,20 @@ class SmartVerseParser:
         
         return resolved
     
-    def insert_verses_smartly(self, text: str, references: List[Dict]) -> str:
+    def insert_verses_smartly(self, text: str, references: List[Dict], segments: Optional[List[Dict]] = None) -> str:
         """
         Insert verses at appropriate points while preserving formatting and flow
+        
+        Pass the segments references were found in to avoid splitting text again
         """
         # Split text into segments
-        segments = self._split_into_segments(text)
+        if segments is None:
+            segments = self._split_into_segments(text)
         
         # Group references by segment
-        refs_by_segment = {}
+        refs_by_segment = defaultdict(list)
         for ref in references:
-            segment_idx = ref['segment_idx']
-            if segment_idx not in refs_by_segment:
-                refs_by_segment[segment_idx] = []
-            refs_by_segment[segment_idx].append(ref)
+            refs_by_segment[ref['segment_idx']].append(ref)
         
         # Build output with verses inserted at segment boundaries
         output_lines = []
@@ -330,17 +384,16 @@ class SmartVerseParser:
         
         for ref in references:
             if 'book' in ref and 'chapter' in ref:
-                # Get verses for this reference
-                for verse_num in range(ref['start_verse'], ref['end_verse'] + 1):
-                    verse_data = self.db.lookup_verse(ref['book'], ref['chapter'], verse_num)
-                    if verse_data and 'text' in verse_data:
-                        # Format reference
-                        book_abbrev = self._get_book_abbreviation(ref['book'])
-                        ref_line = f"<span class='verse-ref'>{book_abbrev} {ref['chapter']}:{verse_num}</span>"
-                        verse_text = f"<span class='verse-text'>{verse_data['text']}</span>"
-                        
-                        verse_lines.append(ref_line)
-                        verse_lines.append(verse_text)
+                # Get verses for this reference in one query
+                verses = self._lookup_verses_range(ref['book'], ref['chapter'], ref['start_verse'], ref['end_verse'])
+                for verse_data in verses:
+                    # Format reference
+                    book_abbrev = self._get_book_abbreviation(ref['book'])
+                    ref_line = f"<span class='verse-ref'>{book_abbrev} {ref['chapter']}:{verse_data['verse']}</span>"
+                    verse_text = f"<span class='verse-text'>{verse_data['text']}</span>"
+                    
+                    verse_lines.append(ref_line)
+                    verse_lines.append(verse_text)
         
         # Add empty line after verses
         verse_lines.append("")
@@ -351,6 +404,5 @@ class SmartVerseParser:
         """
         Get standard abbreviation for book name
         """
-        abbrev_map = {v: k for k, v in self.book_abbreviations.items()}
-        return abbrev_map.get(book_name, book_name)
+        return self._reverse_abbrev.get(book_name, book_name)
 
@@ -1,6 +1,16 @@
 import sqlite3
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+# References per bulk lookup statement; three parameters each keeps a batch
+# under the 999 parameter limit of older SQLite builds
+BULK_LOOKUP_BATCH = 300
+
+# How lookup_verses_bulk finds a requested book, in the order lookup_verse tries
+_BULK_BOOK_JOINS = (
+    'JOIN books b ON b.name = req.book',
+    'JOIN book_abbreviations ba ON ba.abbreviation = req.book JOIN books b ON b.id = ba.book_id',
+)
 
 class SQLiteBibleDatabase:
     def __init__(self, db_path: str = None):
@@ -109,6 +119,92 @@ class SQLiteBibleDatabase:
             print(f"Error looking up verse: {e}")
             return None
     
+    def lookup_verses_range(self, book_name: str, chapter: int, start_verse: int, end_verse: int) -> List[Dict]:
+        """Look up the verses start_verse to end_verse of a chapter, as lookup_verse gives each, in order"""
+        if not self.conn:
+            return []
+        
+        try:
+            cursor = self.conn.cursor()
+            
+            # Try exact book name first
+            cursor.execute('''
+                SELECT b.name, b.abbreviation, v.chapter, v.verse, v.text 
+                FROM verses v 
+                JOIN books b ON v.book_id = b.id 
+                WHERE b.name = ? AND v.chapter = ? AND v.verse BETWEEN ? AND ?
+                ORDER BY v.verse
+            ''', (book_name, chapter, start_verse, end_verse))
+            rows = {row[3]: row for row in cursor.fetchall()}
+            
+            # Try with abbreviations for any verse not found by name
+            if len(rows) < end_verse - start_verse + 1:
+                cursor.execute('''
+                    SELECT b.name, b.abbreviation, v.chapter, v.verse, v.text 
+                    FROM verses v 
+                    JOIN books b ON v.book_id = b.id 
+                    JOIN book_abbreviations ba ON b.id = ba.book_id
+                    WHERE ba.abbreviation = ? AND v.chapter = ? AND v.verse BETWEEN ? AND ?
+                    ORDER BY v.verse
+                ''', (book_name, chapter, start_verse, end_verse))
+                for row in cursor.fetchall():
+                    rows.setdefault(row[3], row)
+            
+            return [{
+                'book_name': row[0],
+                'book_abbreviation': row[1],
+                'chapter': row[2],
+                'verse': row[3],
+                'text': row[4],
+                'reference': f"{row[1]} {row[2]}:{row[3]}"
+            } for _, row in sorted(rows.items())]
+        except Exception as e:
+            print(f"Error looking up verses: {e}")
+            return []
+    
+    def lookup_verses_bulk(self, refs: List[Tuple[str, int, int]]) -> Dict[Tuple[str, int, int], Dict]:
+        """Look up many (book, chapter, verse) keys, returning what lookup_verse gives for each found key"""
+        if not self.conn:
+            return {}
+        
+        results = {}
+        try:
+            cursor = self.conn.cursor()
+            refs = list(dict.fromkeys(refs))
+            
+            # Exact book names first, then abbreviations for the keys left over
+            for book_join in _BULK_BOOK_JOINS:
+                pending = [ref for ref in refs if ref not in results]
+                for i in range(0, len(pending), BULK_LOOKUP_BATCH):
+                    batch = pending[i:i + BULK_LOOKUP_BATCH]
+                    cursor.execute(f'''
+                        WITH req(book, chapter, verse) AS (VALUES {','.join(['(?, ?, ?)'] * len(batch))})
+                        SELECT req.book, req.chapter, req.verse, b.name, b.abbreviation, v.chapter, v.verse, v.text
+                        FROM req
+                        {book_join}
+                        JOIN verses v ON v.book_id = b.id AND v.chapter = req.chapter AND v.verse = req.verse
+                    ''', [value for ref in batch for value in ref])
+                    
+                    for row in cursor.fetchall():
+                        key = (row[0], row[1], row[2])
+                        if key not in results:
+                            results[key] = {
+                                'book_name': row[3],
+                                'book_abbreviation': row[4],
+                                'chapter': row[5],
+                                'verse': row[6],
+                                'text': row[7],
+                                'reference': f"{row[4]} {row[5]}:{row[6]}"
+                            }
+        except Exception as e:
+            print(f"Error looking up verses: {e}")
+        
+        return results
+    
+    def get_verses_bulk(self, refs: List[Tuple[str, int, int]]) -> Dict[Tuple[str, int, int], str]:
+        """Get the text of many (book, chapter, verse) keys, as get_verse gives for each found key"""
+        return {key: verse['text'] for key, verse in self.lookup_verses_bulk(refs).items()}
+    
     def lookup_verses_by_references(self, references: List[str]) -> List[Dict]:
         """Look up multiple verses from reference strings"""
         from src.utils.verse_parser import VerseParser
@@ -189,6 +285,24 @@ class SQLiteBibleDatabase:
             print(f"Error getting books: {e}")
             return []
     
+    def get_book_abbreviations(self) -> List[Tuple[str, str]]:
+        """Get every (abbreviation, book name) pair, in the order lookup_verse prefers them"""
+        if not self.conn:
+            return []
+        
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT ba.abbreviation, b.name 
+                FROM book_abbreviations ba 
+                JOIN books b ON b.id = ba.book_id 
+                ORDER BY ba.id
+            ''')
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Error getting book abbreviations: {e}")
+            return []
+    
     def get_book_by_name(self, name: str) -> Optional[Dict]:
         """Get book information by name or abbreviation"""
         if not self.conn:
@@ -6,7 +6,7 @@ Collects, stores, and manages training data for continuous improvement
 import json
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import sqlite3
 from pathlib import Path
 
@@ -306,7 +306,34 @@ class TrainingDataManager:
         
         conn.close()
         return feedback_list
-    
+
+    def get_recent_feedback_stats(self, days: int = 7) -> Tuple[int, int]:
+        """
+        Get aggregated counts for recent feedback without loading the rows
+
+        Returns:
+            Tuple of (positive_count, total_count)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cutoff_date = datetime.now() - timedelta(days=days)
+
+        cursor.execute(
+            """
+            SELECT
+                SUM(CASE WHEN json_extract(f.feedback_data, '$.is_positive') THEN 1 ELSE 0 END),
+                COUNT(*)
+            FROM feedback f
+            JOIN training_samples s ON f.sample_id = s.id
+            WHERE f.timestamp >= ?
+            """,
+            (cutoff_date.isoformat(),)
+        )
+
+        positive, total = cursor.fetchone()
+        conn.close()
+        return positive or 0, total or 0
+
     def get_performance_logs(self) -> List[Dict]:
         """Get all model performance logs"""
         conn = sqlite3.connect(self.db_path)
@@ -3,6 +3,8 @@
 Migrate SQLite Bible database to PostgreSQL on Render
 """
 
+import csv
+import io
 import sqlite3
 import os
 import sys
@@ -121,11 +123,10 @@ def migrate_database():
         sqlite_cursor.execute("SELECT id, name, abbreviation, testament, book_order, total_chapters FROM books")
         books = sqlite_cursor.fetchall()
         
-        for book in books:
-            pg_cursor.execute(
-                "INSERT INTO books (id, name, abbreviation, testament, book_order, total_chapters) VALUES (%s, %s, %s, %s, %s, %s)",
-                book
-            )
+        pg_cursor.executemany(
+            "INSERT INTO books (id, name, abbreviation, testament, book_order, total_chapters) VALUES (%s, %s, %s, %s, %s, %s)",
+            books
+        )
         print(f"   Migrated {len(books)} books")
         
         # Migrate verses table in batches
@@ -140,11 +141,14 @@ def migrate_database():
             sqlite_cursor.execute(f"SELECT id, book_id, chapter, verse, text FROM verses LIMIT {batch_size} OFFSET {offset}")
             verses_batch = sqlite_cursor.fetchall()
             
-            for verse in verses_batch:
-                pg_cursor.execute(
-                    "INSERT INTO verses (id, book_id, chapter, verse, text) VALUES (%s, %s, %s, %s, %s)",
-                    verse
-                )
+            # Stream each batch through COPY rather than one INSERT per verse
+            batch_csv = io.StringIO()
+            csv.writer(batch_csv).writerows(verses_batch)
+            batch_csv.seek(0)
+            pg_cursor.execute(
+                "COPY verses (id, book_id, chapter, verse, text) FROM STDIN WITH (FORMAT csv)",
+                stream=batch_csv
+            )
             
             offset += batch_size
             print(f"   Migrated {min(offset, total_verses)}/{total_verses} verses...")
@@ -154,11 +158,10 @@ def migrate_database():
         sqlite_cursor.execute("SELECT id, book_id, abbreviation FROM book_abbreviations")
         abbreviations = sqlite_cursor.fetchall()
         
-        for abbr in abbreviations:
-            pg_cursor.execute(
-                "INSERT INTO book_abbreviations (id, book_id, abbreviation) VALUES (%s, %s, %s)",
-                abbr
-            )
+        pg_cursor.executemany(
+            "INSERT INTO book_abbreviations (id, book_id, abbreviation) VALUES (%s, %s, %s)",
+            abbreviations
+        )
         print(f"   Migrated {len(abbreviations)} abbreviations")
         
         # Update sequences for auto-increment
@@ -8,6 +8,31 @@ import psycopg2
 import os
 from psycopg2.extras import execute_batch
 
+# Indexes built once the verses are loaded: a trigram index that lets
+# search_verses' ILIKE '%...%' use an index scan instead of reading every
+# verse. It is built CONCURRENTLY so a live app keeps reading and writing
+# while it builds, which cannot run inside a transaction
+SEARCH_INDEX_STATEMENTS = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_bible_verses_text_trgm ON bible_verses USING GIN (text gin_trgm_ops)',
+)
+
+def create_search_indexes(pg_conn):
+    """Create the bible_verses search indexes, each a no-op once applied"""
+    print("Creating search indexes...")
+    pg_conn.commit()
+    pg_conn.autocommit = True
+    pg_cursor = pg_conn.cursor()
+    
+    for statement in SEARCH_INDEX_STATEMENTS:
+        try:
+            pg_cursor.execute(statement)
+            print(f"  {statement.split(' ON ')[0]}")
+        except Exception as e:
+            # Queries still work, only without the index; a failed
+            # concurrent build leaves an invalid index to drop first
+            print(f"  WARNING: could not run '{statement}': {e}")
+
 def migrate_to_postgres():
     """Migrate Bible verses from SQLite to PostgreSQL"""
     
@@ -109,6 +134,8 @@ def migrate_to_postgres():
         for row in pg_cursor.fetchall():
             print(f"  {row[0]} {row[1]}:{row[2]} - {row[3]}...")
         
+        create_search_indexes(pg_conn)
+        
     except Exception as e:
         print(f"Error during migration: {e}")
         pg_conn.rollback()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Test that the HTML converter marks exactly the verse references it extracts
+"""
+
+import re
+import sys
+sys.path.insert(0, 'bible-outline-enhanced-backend/src')
+
+from utils.pdf_to_html_converter import PDFToHTMLConverter
+
+SAMPLE_OUTLINE = """Message Twelve
+Scripture Reading: Eph. 4:7-16; 6:10-20
+I. The ascended Christ gave gifts to men - Psalm 68:18; Eph. 4:8:
+A. He led captive those who were taken captive (v. 8; cf. Num. 10:35).
+B. The Spirit was poured out on the day of Pentecost - Acts 2:33; John 14:6a.
+1. We must be perfected unto the work of ministry - vv. 11-12; 1 Cor. 12:4-11.
+2. Arrive at the full knowledge of the Son of God (Col. 2:2; 2 Pet. 1:3).
+a. Each one part operating in its measure - cf. Rom. 12:3; Eph. 4:16
+II. Put on the whole armor of God - 6:11, 13; 2 Tim. 2:3-4
+"""
+
+VERSE_SPAN_RE = re.compile(r'<span class="verse-ref">(.*?)</span>')
+
+def test_marked_references_match_extracted():
+    converter = PDFToHTMLConverter()
+
+    for line in SAMPLE_OUTLINE.splitlines():
+        marked = VERSE_SPAN_RE.findall(converter._mark_verse_references(line))
+        # A cf. reference contains a full reference, which the marking
+        # wraps on its own, so only the inner reference gets a span
+        extracted = [verse for verse in converter._extract_verses_from_text(line) if not verse.startswith('cf.')]
+        assert sorted(marked) == sorted(extracted), line
+
+if __name__ == "__main__":
+    test_marked_references_match_extracted()
+    print("Marked and extracted verse references agree")